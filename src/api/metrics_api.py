@@ -0,0 +1,81 @@
+from typing import Any, Iterator
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import Counter, Gauge, HistogramMetric, Metric, registry
+from db.database import engine
+from db.pool import pool_stats
+from services.cache import link_cache
+from services.click_recorder import click_recorder
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router_metrics = APIRouter()
+
+
+def _gauge(name: str, documentation: str, value: float) -> Gauge:
+    metric = Gauge(name, documentation)
+    metric.set((), value)
+    return metric
+
+
+def _counter(name: str, documentation: str, value: float) -> Counter:
+    metric = Counter(name, documentation)
+    metric.inc((), value)
+    return metric
+
+
+def collect_service_metrics() -> Iterator[Metric]:
+    cache = link_cache.stats()
+    if "size" in cache:
+        yield _gauge("link_cache_entries", "Cached links.", cache["size"])
+    for name in ("hits", "negative_hits", "misses", "errors"):
+        yield _counter(
+            f"link_cache_{name}_total",
+            f"Link cache {name.replace('_', ' ')}.",
+            cache[name],
+        )
+    clicks = click_recorder.stats()
+    yield _gauge(
+        "click_queue_depth",
+        "Clicks waiting to be written.",
+        clicks["queue_depth"],
+    )
+    for name in ("recorded", "dropped", "failed"):
+        yield _counter(
+            f"clicks_{name}_total",
+            f"Clicks {name} by the click recorder.",
+            clicks[name],
+        )
+    pool = engine.pool.stats()
+    for name in ("size", "checked_in", "checked_out", "overflow", "waiting"):
+        yield _gauge(
+            f"db_pool_{name}",
+            f"DB connection pool {name.replace('_', ' ')}.",
+            pool[name],
+        )
+    yield _counter(
+        "db_pool_timeouts_total",
+        "DB connection checkouts that timed out.",
+        pool["timeouts"],
+    )
+    checkout_latency = HistogramMetric(
+        "db_pool_checkout_duration_seconds", "DB connection checkout latency."
+    )
+    checkout_latency.set_histogram((), pool_stats.checkout_latency)
+    yield checkout_latency
+
+
+registry.add_collector(collect_service_metrics)
+
+
+@router_metrics.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def read_metrics() -> Any:
+    return PlainTextResponse(
+        registry.render(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
+from api.v1.service_api import router_service
 from api.v1.short_link_api import router_link
 
 api_router = APIRouter()
 api_router.include_router(router_link, prefix="/shorten", tags=["Short link"])
+api_router.include_router(router_service, prefix="/service", tags=["Service"])
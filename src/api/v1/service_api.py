@@ -0,0 +1,55 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, status
+
+from db.database import engine, replica_router
+from services.cache import link_cache
+from services.click_recorder import click_recorder
+from services.lifecycle import worker_state
+
+router_service = APIRouter()
+
+
+@router_service.get(
+    "/cache",
+    description="Get link resolution cache statistics.",
+)
+async def read_cache_stats() -> Any:
+    return link_cache.stats()
+
+
+@router_service.get(
+    "/clicks",
+    description="Get click recording queue statistics.",
+)
+async def read_click_stats() -> Any:
+    return click_recorder.stats()
+
+
+@router_service.get(
+    "/pool",
+    description="Get DB connection pool statistics.",
+)
+async def read_pool_stats() -> Any:
+    return engine.pool.stats()
+
+
+@router_service.get(
+    "/replicas",
+    description="Get read replica health.",
+)
+async def read_replica_stats() -> Any:
+    return replica_router.stats()
+
+
+@router_service.get(
+    "/ready",
+    description="Check that the worker is warmed up and not shutting down.",
+)
+async def read_ready() -> Any:
+    if worker_state.draining or not worker_state.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Shutting down" if worker_state.draining else "Warming up",
+        )
+    return {"status": "ready"}
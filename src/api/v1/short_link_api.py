@@ -1,76 +1,260 @@
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+import orjson
+
+from fastapi import (APIRouter, Depends, HTTPException, Query, Request,
+                     Response, status)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import RedirectResponse
 
-from db.database import get_session
+from core.config import app_settings
+from db.database import get_read_session, get_session
 from schemas import short_link_schema
-from services.short_link_crud import link_crud, transfer_crud
+from services.click_recorder import click_recorder
+from services.http_cache import (cache_headers, is_not_modified, make_etag,
+                                 not_modified)
+from services.rate_limit import (rate_limit_bulk, rate_limit_create,
+                                 rate_limit_transfer)
+from services.serializers import link_dict, status_dict
+from services.short_link_crud import CreateResult, link_crud, transfer_crud
 
 router_link = APIRouter()
 
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+STATS_DEFAULT_PERIOD = timedelta(days=7)
+
+
 def dashing_query(default: Any, *, convert_underscores=True, **kwargs) -> Any:
     query = Query(default, **kwargs)
     query.convert_underscores = convert_underscores
     return query
 
 
+def as_utc(date: datetime) -> datetime:
+    """Convert an aware datetime to the naive UTC used by the DB."""
+    if date.tzinfo is None:
+        return date
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def iter_full_status(
+    db: AsyncSession,
+    links: list,
+    *,
+    transfer_offset: int = 0,
+    transfer_limit: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Encode links as StatusFullBase JSON, streaming their transfers."""
+    for number, link in enumerate(links):
+        head = orjson.dumps(link_dict(link))[:-1]
+        yield (b"," if number else b"") + head
+        yield b',"transfer":['
+        separator = b""
+        async for transfer in transfer_crud.stream_for_link(
+            db, link.key, offset=transfer_offset, limit=transfer_limit
+        ):
+            yield separator + orjson.dumps(transfer._asdict())
+            separator = b","
+        yield b"]}"
+
+
+async def iter_json_list(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield b"["
+    async for chunk in chunks:
+        yield chunk
+    yield b"]"
+
+
+def status_validators(
+    links: list, *params: Any
+) -> tuple[str, datetime | None]:
+    """ETag and Last-Modified of the status of ``links``.
+
+    ``params`` are the query parameters that shape the response.
+    """
+    etag = make_etag(
+        *params,
+        *(
+            (
+                link.id,
+                link.original_url,
+                link.deleted,
+                link.updated_at,
+                link.transfer_count,
+                link.last_transfer_at,
+            )
+            for link in links
+        ),
+    )
+    dates = [
+        date
+        for link in links
+        for date in (link.updated_at, link.last_transfer_at)
+        if date is not None
+    ]
+    return etag, max(dates, default=None)
+
+
+def redirect_response(url: str) -> RedirectResponse:
+    response = RedirectResponse(
+        url,
+        status_code=(
+            status.HTTP_301_MOVED_PERMANENTLY
+            if app_settings.redirect_permanent
+            else status.HTTP_307_TEMPORARY_REDIRECT
+        ),
+    )
+    if app_settings.redirect_cache_control:
+        response.headers["Cache-Control"] = (
+            app_settings.redirect_cache_control
+        )
+    return response
+
+
+def use_dedup(dedup: bool | None) -> bool:
+    return app_settings.link_dedup if dedup is None else dedup
+
+
+def bulk_result_detail(result: CreateResult) -> str | None:
+    if result.link is None:
+        return "Could not generate a unique short link"
+    if not result.created:
+        return "Link already exists"
+    return None
+
+
+async def get_links_page(
+    db: AsyncSession,
+    *,
+    skip: int,
+    limit: int,
+    cursor: str | None,
+    live: bool,
+) -> tuple[list, str | None]:
+    """Get a page of links and the cursor of the next page, if any."""
+    try:
+        links = await link_crud.get_multi(
+            db, skip=skip, limit=limit, cursor=cursor, live=live
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    if links and len(links) == limit:
+        return links, link_crud.make_cursor(links[-1])
+    return links, None
+
+
 @router_link.get(
     "",
     response_model=list[short_link_schema.Link],
-    description="Retrieve short links.",
+    description=(
+        "Retrieve short links. Pass the X-Next-Cursor header value of the "
+        "previous page as `cursor` to page by keyset instead of `skip`. "
+        "With `live` deleted links are left out."
+    ),
 )
 async def read_links(
-    db: AsyncSession = Depends(get_session), skip: int = 0, limit: int = 100
+    db: AsyncSession = Depends(get_read_session),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    live: bool = False,
 ) -> Any:
-    return await link_crud.get_multi(db, skip=skip, limit=limit)
+    links, next_cursor = await get_links_page(
+        db, skip=skip, limit=limit, cursor=cursor, live=live
+    )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return ORJSONResponse([link_dict(link) for link in links], headers=headers)
 
 
 @router_link.post(
     "/bulk",
-    response_model=list[short_link_schema.Link],
+    response_model=(
+        list[short_link_schema.Link]
+        | list[short_link_schema.LinkBulkResult]
+    ),
     status_code=status.HTTP_201_CREATED,
-    description="Bulk create new short links."
+    dependencies=[Depends(rate_limit_bulk)],
+    description=(
+        "Bulk create new short links. Links that could not be created are "
+        "skipped and the status is 207; pass `report` to get the result "
+        "of every item. With `dedup` already shortened URLs reuse their "
+        "existing link (defaults to the LINK_DEDUP setting)."
+    ),
 )
 async def bulk_create_link(
     *,
     db: AsyncSession = Depends(get_session),
     link_in: list[short_link_schema.LinkCreate],
+    report: bool = False,
+    dedup: bool | None = None,
 ) -> Any:
-    return await link_crud.bulk_create(db, obj_in=link_in)
+    results = await link_crud.bulk_create(
+        db, obj_in=link_in, dedup=use_dedup(dedup)
+    )
+    status_code = status.HTTP_201_CREATED
+    if not all(result.link for result in results):
+        status_code = status.HTTP_207_MULTI_STATUS
+    if not report:
+        content = [link_dict(result.link) for result in results if result.link]
+    else:
+        content = [
+            {
+                "index": index,
+                "created": result.created,
+                "link": result.link and link_dict(result.link),
+                "detail": bulk_result_detail(result),
+            }
+            for index, result in enumerate(results)
+        ]
+    return ORJSONResponse(content, status_code=status_code)
 
 
 @router_link.post(
     "",
     response_model=short_link_schema.Link,
     status_code=status.HTTP_201_CREATED,
-    description="Create new short link."
+    dependencies=[Depends(rate_limit_create)],
+    description=(
+        "Create new short link. With `dedup` an already shortened URL "
+        "returns its existing link with status 200 (defaults to the "
+        "LINK_DEDUP setting)."
+    ),
 )
 async def create_link(
     *,
+    response: Response,
     db: AsyncSession = Depends(get_session),
     link_in: short_link_schema.LinkCreate,
+    dedup: bool | None = None,
 ) -> Any:
-    return await link_crud.create(db, obj_in=link_in)
+    if not use_dedup(dedup):
+        return await link_crud.create(db, obj_in=link_in)
+    link, created = await link_crud.get_or_create(db, obj_in=link_in)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return link
 
 
 @router_link.get(
     "/transfer/{id}",
     tags=["Transfer link"],
+    dependencies=[Depends(rate_limit_transfer)],
     description="Safe transfer action and redirect to original link."
 )
 async def transfer_link(
     *,
     request: Request,
+    # A miss is cached: read it from the primary, see resolve.
     db: AsyncSession = Depends(get_session),
     id: str,
 ) -> Any:
-    link = await link_crud.get(db, id)
+    link = await link_crud.resolve(db, id)
     if not link:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Link not found"
@@ -82,10 +266,50 @@ async def transfer_link(
     client_host = request.client.host
     transfer_in = short_link_schema.TransferCreate(
         client_host=client_host,
-        link_id=link.id,
+        link_id=id,
     )
-    await transfer_crud.create(db, obj_in=transfer_in)
-    return RedirectResponse(link.original_url)
+    click_recorder.record(transfer_in, link.key)
+    return redirect_response(link.original_url)
+
+
+@router_link.post(
+    "/resolve",
+    response_model=list[short_link_schema.LinkResolved],
+    description=(
+        "Resolve many short links at once, in the order of `ids`. Unknown "
+        "ids are marked `missing`; removed links are returned with "
+        "`deleted` set."
+    ),
+)
+async def resolve_links(
+    *,
+    # A miss is cached: read it from the primary, see resolve.
+    db: AsyncSession = Depends(get_session),
+    resolve_in: short_link_schema.LinkResolve,
+) -> Any:
+    resolved = await link_crud.resolve_many(db, resolve_in.ids)
+    results = []
+    for id in resolve_in.ids:
+        link = resolved[id]
+        if link is None:
+            results.append(
+                {
+                    "id": id,
+                    "original_url": None,
+                    "deleted": None,
+                    "missing": True,
+                }
+            )
+        else:
+            results.append(
+                {
+                    "id": id,
+                    "original_url": link.original_url,
+                    "deleted": link.deleted,
+                    "missing": False,
+                }
+            )
+    return ORJSONResponse(results)
 
 
 @router_link.get(
@@ -103,51 +327,87 @@ async def ping_db(db: AsyncSession = Depends(get_session)):
     "/status",
     response_model=list[short_link_schema.StatusFullBase],
     tags=["Status info"],
-    description="Retrieve status info."
+    description=(
+        "Retrieve status info. With `live` deleted links are left out."
+    ),
 )
 async def read_retrieve_status(
-    db: AsyncSession = Depends(get_session),
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
     full_info: Any = dashing_query(False),
     max_result: int = dashing_query(100),
     offset: int = 0,
+    cursor: str | None = None,
+    live: bool = False,
 ) -> Any:
-    if full_info is False:
-        companies = parse_obj_as(
-            list[short_link_schema.StatusBase],
-            await link_crud.get_multi(db, skip=offset, limit=max_result),
+    links, next_cursor = await get_links_page(
+        db, skip=offset, limit=max_result, cursor=cursor, live=live
+    )
+    full = full_info is not False
+    etag, last_modified = status_validators(links, full, next_cursor, live)
+    headers = cache_headers(
+        etag, last_modified, app_settings.read_cache_control
+    )
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
+    if not full:
+        return ORJSONResponse(
+            [status_dict(link) for link in links], headers=headers
         )
-        return JSONResponse(jsonable_encoder(companies))
-    return await link_crud.get_multi(db, skip=offset, limit=max_result)
+    return StreamingResponse(
+        iter_json_list(iter_full_status(db, links)),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router_link.get(
     "/{id}",
     response_model=short_link_schema.Link,
-    description="Get link by ID.",
+    description=(
+        "Get link by ID. Answers 304 if the ETag in If-None-Match (or "
+        "If-Modified-Since) shows that the client copy is current."
+    ),
 )
 async def read_link(
     *,
+    request: Request,
+    response: Response,
+    # A miss is cached: read it from the primary, see resolve.
     db: AsyncSession = Depends(get_session),
     id: str,
 ) -> Any:
-    link = await link_crud.get(db, id)
+    link = await link_crud.resolve(db, id)
     if not link:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
         )
-    return link
+    etag = make_etag(id, link.original_url, link.deleted, link.updated_at)
+    headers = cache_headers(
+        etag, link.updated_at, app_settings.read_cache_control
+    )
+    if is_not_modified(request, etag, link.updated_at):
+        return not_modified(headers)
+    response.headers.update(headers)
+    return {"id": id, **link._asdict()}
 
 
 @router_link.get(
     "/{id}/status",
     response_model=short_link_schema.StatusFullBase,
     tags=["Status info"],
-    description="Get status info by ID.",
+    description=(
+        "Get status info by ID. With full-info the transfer list is "
+        "streamed and paged by max-result and offset."
+    ),
 )
 async def read_status(
     *,
+    request: Request,
     id: str,
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
     full_info: Any = dashing_query(False),
     max_result: int = dashing_query(100),
     offset: int = 0,
@@ -157,10 +417,75 @@ async def read_status(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
         )
-    if full_info is False:
-        companies = parse_obj_as(list[short_link_schema.StatusBase], link)
-        return JSONResponse(jsonable_encoder(companies))
-    return link
+    full = full_info is not False
+    etag, last_modified = status_validators(
+        [link], full, full and (offset, max_result)
+    )
+    headers = cache_headers(
+        etag, last_modified, app_settings.read_cache_control
+    )
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
+    if not full:
+        return ORJSONResponse(status_dict(link), headers=headers)
+    return StreamingResponse(
+        iter_full_status(
+            db, [link], transfer_offset=offset, transfer_limit=max_result
+        ),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+@router_link.get(
+    "/{id}/stats",
+    response_model=short_link_schema.LinkStats,
+    tags=["Status info"],
+    description=(
+        "Get the number of transfers per time bucket in [from, to). "
+        "Defaults to the last 7 days by hour; empty buckets are omitted."
+    ),
+)
+async def read_stats(
+    *,
+    id: str,
+    db: AsyncSession = Depends(get_read_session),
+    date_from: datetime | None = Query(None, alias="from"),
+    date_to: datetime | None = Query(None, alias="to"),
+    granularity: short_link_schema.Granularity = (
+        short_link_schema.Granularity.hour
+    ),
+) -> Any:
+    # Not cached: a replica read must not outlive its lag in the cache.
+    if not await link_crud.lookup(db, id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
+        )
+    date_to = as_utc(date_to) if date_to else datetime.utcnow()
+    if date_from:
+        date_from = as_utc(date_from)
+    else:
+        date_from = date_to - STATS_DEFAULT_PERIOD
+    if date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be earlier than 'to'",
+        )
+    buckets = await transfer_crud.get_rollups(
+        db,
+        link_id=id,
+        granularity=granularity,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    return short_link_schema.LinkStats(
+        id=id,
+        granularity=granularity,
+        date_from=date_from,
+        date_to=date_to,
+        total=sum(bucket.count for bucket in buckets),
+        buckets=parse_obj_as(list[short_link_schema.StatsBucket], buckets),
+    )
 
 
 @router_link.put(
@@ -0,0 +1,95 @@
+"""Short id generation rate and collision rate as the table fills up.
+
+Usage: python -m benchmarks.bench_id_generation [--dsn DSN] [--repeat N]
+
+The collision part is simulated in memory on a 3-character keyspace, which
+behaves like the 6-character one at the same fill ratio.
+"""
+import asyncio
+from time import perf_counter
+
+from benchmarks.common import db_argument_parser, make_engine
+from core.config import app_settings
+from db.database import Base
+from services.id_generator import RandomIdGenerator, SequenceIdGenerator
+
+FILL_RATIOS = (0.01, 0.1, 0.5, 0.9)
+SIMULATED_LENGTH = 3
+DRAWS = 10_000
+
+
+async def generation_rate(generator, db, count: int) -> float:
+    started = perf_counter()
+    for _ in range(count):
+        await generator.next_id(db)
+    return count / (perf_counter() - started)
+
+
+async def collision_rates(max_attempts: int) -> None:
+    print(
+        f"{'fill':>6}{'random collisions':>20}{'random failed':>16}"
+        f"{'sequence collisions':>22}"
+    )
+    for ratio in FILL_RATIOS:
+        random_generator = RandomIdGenerator(SIMULATED_LENGTH)
+        sequence_generator = SequenceIdGenerator(SIMULATED_LENGTH, 1)
+        target = int(sequence_generator.keyspace * ratio)
+        taken = set()
+        while len(taken) < target:
+            taken.add(await random_generator.next_id(None))
+        collisions = failed = 0
+        for _ in range(DRAWS):
+            for _ in range(max_attempts):
+                if await random_generator.next_id(None) not in taken:
+                    break
+                collisions += 1
+            else:
+                failed += 1
+        sequence_taken = {
+            sequence_generator.id_for(number) for number in range(target)
+        }
+        sequence_collisions = sum(
+            sequence_generator.id_for(number) in sequence_taken
+            for number in range(target, target + DRAWS)
+        )
+        print(
+            f"{ratio:>6.0%}{collisions / DRAWS:>20.4f}{failed / DRAWS:>16.4f}"
+            f"{sequence_collisions / DRAWS:>22.4f}"
+        )
+
+
+async def main(dsn: str, repeat: int) -> None:
+    length = app_settings.short_link_length
+    engine, session_factory = make_engine(dsn)
+    async with engine.begin() as connect:
+        await connect.run_sync(Base.metadata.create_all)
+    try:
+        async with session_factory() as db:
+            print("Generation rate (ids/s)")
+            random_rate = await generation_rate(
+                RandomIdGenerator(length), db, repeat
+            )
+            print(f"{'random':<32}{random_rate:>14.0f}")
+            for block_size in (1, 100, 1000):
+                sequence_rate = await generation_rate(
+                    SequenceIdGenerator(length, block_size), db, repeat
+                )
+                print(
+                    f"{f'sequence (block {block_size})':<32}"
+                    f"{sequence_rate:>14.0f}"
+                )
+    finally:
+        async with engine.begin() as connect:
+            await connect.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+    print()
+    print(
+        "Collisions per generated id "
+        f"(max {app_settings.short_link_max_attempts} attempts)"
+    )
+    await collision_rates(app_settings.short_link_max_attempts)
+
+
+if __name__ == "__main__":
+    args = db_argument_parser(__doc__).parse_args()
+    asyncio.run(main(args.dsn, args.repeat))
@@ -0,0 +1,279 @@
+"""Load test of the HTTP API: throughput and latency per workload.
+
+Usage:
+    python -m benchmarks.bench_load [--url URL] [--workloads ...]
+        [--requests N] [--concurrency C] [--links N] [--zipf S] [--save]
+    python -m benchmarks.bench_load --compare BASE.json NEW.json
+
+Without ``--url`` the app is driven in-process through the httpx ASGI
+transport and uses its own POSTGRES_* settings, so point them at a scratch
+database (``--reset`` recreates the tables there). With ``--url`` requests
+go to a running server, e.g. ``python server.py``.
+
+Redirect and status requests pick links with Zipf-distributed popularity:
+the k-th most popular of ``--links`` seeded links is requested with weight
+1 / k ** s. With ``--save`` the results are written to
+``benchmarks/results/<commit>-<target>.json`` for ``--compare``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+from datetime import datetime
+from itertools import accumulate
+from pathlib import Path
+from time import perf_counter
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.common import summarize
+
+PREFIX = "/api/v1/shorten"
+RESULTS_DIR = Path(__file__).parent / "results"
+WORKLOADS = ("create", "bulk", "redirect", "status")
+SEED_CHUNK_SIZE = 1000
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def zipf_sampler(
+    items: list[str], exponent: float, rng: random.Random
+) -> Callable[[], str]:
+    cum_weights = list(
+        accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1))
+    )
+    return lambda: rng.choices(items, cum_weights=cum_weights)[0]
+
+
+def make_workloads(
+    ids: list[str], args: argparse.Namespace
+) -> dict[str, tuple[Request, set[int]]]:
+    """Request factory and expected status codes of every workload."""
+    rng = random.Random(args.seed)
+    popular = zipf_sampler(ids, args.zipf, rng)
+
+    def create(client, number):
+        return client.post(
+            PREFIX, json={"original_url": f"bench.example/c/{number}"}
+        )
+
+    def bulk(client, number):
+        return client.post(
+            f"{PREFIX}/bulk",
+            json=[
+                {"original_url": f"bench.example/b/{number}/{index}"}
+                for index in range(args.bulk_size)
+            ],
+        )
+
+    def redirect(client, number):
+        return client.get(f"{PREFIX}/transfer/{popular()}")
+
+    def status(client, number):
+        return client.get(f"{PREFIX}/{popular()}/status")
+
+    return {
+        "create": (create, {201}),
+        "bulk": (bulk, {201}),
+        "redirect": (redirect, {307}),
+        "status": (status, {200}),
+    }
+
+
+async def seed_links(client: httpx.AsyncClient, count: int) -> list[str]:
+    ids = []
+    for start in range(0, count, SEED_CHUNK_SIZE):
+        response = await client.post(
+            f"{PREFIX}/bulk",
+            json=[
+                {"original_url": f"bench.example/s/{number}"}
+                for number in range(start, min(start + SEED_CHUNK_SIZE, count))
+            ],
+        )
+        response.raise_for_status()
+        ids.extend(link["id"] for link in response.json())
+    return ids
+
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    request: Request,
+    expected: set[int],
+    *,
+    requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    samples = []
+    errors = 0
+    numbers = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in numbers:
+            started = perf_counter()
+            response = await request(client, number)
+            samples.append(perf_counter() - started)
+            if response.status_code not in expected:
+                errors += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    return {
+        **summarize(samples),
+        "errors": errors,
+        "throughput": len(samples) / elapsed,
+    }
+
+
+async def run(args: argparse.Namespace, client: httpx.AsyncClient) -> dict:
+    ids = await seed_links(client, args.links)
+    workloads = make_workloads(ids, args)
+    results = {}
+    for name in args.workloads:
+        request, expected = workloads[name]
+        # Warm up connections, caches and prepared statements.
+        await run_workload(
+            client, request, expected, requests=args.concurrency,
+            concurrency=args.concurrency,
+        )
+        results[name] = await run_workload(
+            client, request, expected, requests=args.requests,
+            concurrency=args.concurrency,
+        )
+    return results
+
+
+async def run_in_process(args: argparse.Namespace) -> dict:
+    from db.database import Base, engine
+    from main import app
+
+    async with engine.begin() as connect:
+        if args.reset:
+            await connect.run_sync(Base.metadata.drop_all)
+        await connect.run_sync(Base.metadata.create_all)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            app=app, base_url="http://bench"
+        ) as client:
+            return await run(args, client)
+
+
+async def run_remote(args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=30
+    ) as client:
+        return await run(args, client)
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return revision
+
+
+def print_results(results: dict[str, dict[str, float]]) -> None:
+    print(
+        f"{'workload':<12}{'requests':>10}{'errors':>8}{'req/s':>10}"
+        f"{'p50':>10}{'p95':>10}{'p99':>10}  (ms)"
+    )
+    for name, row in results.items():
+        print(
+            f"{name:<12}{row['count']:>10}{row['errors']:>8}"
+            f"{row['throughput']:>10.1f}{row['p50']:>10.3f}"
+            f"{row['p95']:>10.3f}{row['p99']:>10.3f}"
+        )
+
+
+def compare(base_path: str, new_path: str) -> None:
+    base, new = (
+        json.loads(Path(path).read_text()) for path in (base_path, new_path)
+    )
+    print(f"{base['revision']} -> {new['revision']}")
+    print(
+        f"{'workload':<12}{'metric':>12}{'base':>12}{'new':>12}"
+        f"{'change':>10}"
+    )
+    for name, row in new["workloads"].items():
+        base_row = base["workloads"].get(name)
+        if base_row is None:
+            continue
+        for metric in ("throughput", "p50", "p95", "p99"):
+            before = base_row[metric]
+            change = row[metric] / before - 1 if before else 0.0
+            print(
+                f"{name:<12}{metric:>12}{before:>12.3f}"
+                f"{row[metric]:>12.3f}{change:>+10.1%}"
+            )
+
+
+def save(args: argparse.Namespace, results: dict) -> Path:
+    revision = git_revision()
+    target = "asgi" if args.url is None else "http"
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{revision}-{target}.json"
+    settings = {
+        key: value for key, value in vars(args).items()
+        if key not in ("compare", "save")
+    }
+    path.write_text(
+        json.dumps(
+            {
+                "revision": revision,
+                "date": datetime.utcnow().isoformat(),
+                "target": target,
+                "settings": settings,
+                "workloads": results,
+            },
+            indent=2,
+        )
+    )
+    return path
+
+
+def argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--url", help="Base URL of a running server.")
+    parser.add_argument(
+        "--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS)
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--bulk-size", type=int, default=100)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--reset", action="store_true",
+        help="Drop and recreate the tables first (in-process only).",
+    )
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    return parser
+
+
+def main() -> None:
+    args = argument_parser().parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    runner = run_in_process if args.url is None else run_remote
+    results = asyncio.run(runner(args))
+    print_results(results)
+    if args.save:
+        print(f"Saved to {save(args, results)}")
+
+
+if __name__ == "__main__":
+    main()
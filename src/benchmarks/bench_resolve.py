@@ -0,0 +1,88 @@
+"""Redirect lookup latency depending on the number of link transfers.
+
+Usage: python -m benchmarks.bench_resolve [--dsn DSN] [--repeat N]
+
+``orm`` loads the link the way redirects did before the lightweight path:
+the ORM entity with all its transfers and a correlated COUNT of them, so
+it gets slower the more a link is clicked. ``get`` reads the link row
+alone, ``lookup`` (the redirect path) also checks the archive of compacted
+links; neither depends on the number of transfers.
+"""
+import asyncio
+
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.orm import selectinload
+
+from benchmarks.common import (db_argument_parser, make_engine, measure,
+                               print_table, summarize)
+from db.database import Base
+from models.short_link_model import Link, Transfer
+from services.short_link_crud import link_crud
+
+TRANSFER_COUNTS = (0, 1_000, 100_000)
+# Loading 100k transfers takes long, the ORM baseline needs fewer samples.
+ORM_REPEAT = 20
+
+ORM_LOAD = (
+    select(
+        Link,
+        select(func.count(Transfer.id))
+        .where(Transfer.link_key == Link.key)
+        .scalar_subquery(),
+    )
+    .options(selectinload(Link.transfer))
+    .where(Link.id == bindparam("b_id"))
+)
+
+
+async def orm_load(db, id: str) -> None:
+    (await db.execute(ORM_LOAD, {"b_id": id})).one_or_none()
+
+
+async def main(dsn: str, repeat: int) -> None:
+    engine, session_factory = make_engine(dsn)
+    async with engine.begin() as connect:
+        await connect.run_sync(Base.metadata.create_all)
+    try:
+        async with session_factory() as db:
+            for count in TRANSFER_COUNTS:
+                db.add(Link(id=f"bench{count}", original_url="http://a.b"))
+            await db.commit()
+            for count in TRANSFER_COUNTS:
+                await db.execute(
+                    text(
+                        "INSERT INTO transfer (date, client_host, link_key) "
+                        "SELECT now(), '127.0.0.1', link.key "
+                        "FROM link, generate_series(1, :count) "
+                        "WHERE link.id = :id"
+                    ),
+                    {"id": f"bench{count}", "count": count},
+                )
+            await db.commit()
+
+        rows = {}
+        for count in TRANSFER_COUNTS:
+            id = f"bench{count}"
+            for name, method, times in (
+                ("orm", orm_load, min(repeat, ORM_REPEAT)),
+                ("get", link_crud.get, repeat),
+                ("lookup", link_crud.lookup, repeat),
+            ):
+                async with session_factory() as db:
+
+                    async def call():
+                        await method(db, id)
+                        db.expunge_all()
+
+                    samples = await measure(call, repeat=times)
+                rows[f"{name} ({count} transfers)"] = summarize(samples)
+        print_table("Link lookup latency", rows)
+    finally:
+        async with engine.begin() as connect:
+            await connect.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = db_argument_parser(__doc__).parse_args()
+    asyncio.run(main(args.dsn, args.repeat))
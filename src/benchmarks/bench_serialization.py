@@ -0,0 +1,103 @@
+"""Encoding cost of link and status pages.
+
+Usage: python -m benchmarks.bench_serialization [--repeat N]
+
+Compares the pydantic path (validation against the response schema, then
+``jsonable_encoder``) with the dicts of ``services.serializers`` encoded by
+``ORJSONResponse``, for pages of 100, 1000 and 10000 items. Both must
+produce the same JSON. No database is needed.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import NamedTuple
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import parse_obj_as
+
+from schemas.short_link_schema import Link, StatusBase
+from services.serializers import link_dict, status_dict
+
+PAGE_SIZES = (100, 1000, 10000)
+
+
+class LinkRow(NamedTuple):
+    id: str
+    original_url: str
+    created_at: datetime
+    deleted: bool
+    transfer_count: int
+
+
+def make_rows(count: int) -> list[LinkRow]:
+    created_at = datetime(2026, 10, 18, 12, 30, 15, 123456)
+    return [
+        LinkRow(
+            f"id{number:06}",
+            f"http://example.com/page/{number}",
+            created_at + timedelta(seconds=number),
+            number % 10 == 0,
+            number,
+        )
+        for number in range(count)
+    ]
+
+
+async def pydantic_links(rows: list[LinkRow]) -> bytes:
+    # What FastAPI does with a response_model.
+    field = create_response_field("response", list[Link])
+    content = await serialize_response(field=field, response_content=rows)
+    return ORJSONResponse(content).body
+
+
+async def fast_links(rows: list[LinkRow]) -> bytes:
+    return ORJSONResponse([link_dict(row) for row in rows]).body
+
+
+async def pydantic_status(rows: list[LinkRow]) -> bytes:
+    statuses = parse_obj_as(list[StatusBase], rows)
+    return JSONResponse(jsonable_encoder(statuses)).body
+
+
+async def fast_status(rows: list[LinkRow]) -> bytes:
+    return ORJSONResponse([status_dict(row) for row in rows]).body
+
+
+async def timed(func, rows: list[LinkRow], repeat: int) -> float:
+    """Mean milliseconds per call."""
+    started = perf_counter()
+    for _ in range(repeat):
+        await func(rows)
+    return (perf_counter() - started) / repeat * 1000
+
+
+async def main(repeat: int) -> None:
+    print(f"{'case':<24}{'pydantic':>12}{'fast':>12}{'speedup':>10}  (ms)")
+    for size in PAGE_SIZES:
+        rows = make_rows(size)
+        times = max(repeat * 100 // size, 1)
+        for name, slow, fast in (
+            ("links", pydantic_links, fast_links),
+            ("status", pydantic_status, fast_status),
+        ):
+            assert orjson.loads(await slow(rows)) == orjson.loads(
+                await fast(rows)
+            ), name
+            slow_ms = await timed(slow, rows, times)
+            fast_ms = await timed(fast, rows, times)
+            print(
+                f"{f'{name} x {size}':<24}{slow_ms:>12.3f}{fast_ms:>12.3f}"
+                f"{slow_ms / fast_ms:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,155 @@
+"""Per-call CPU cost of the hot repository statements.
+
+Usage: python -m benchmarks.bench_statements [--dsn DSN] [--repeat N]
+
+Every operation runs twice: with a statement built per call and loaded
+through the ORM, and through the prebuilt Core statements of the
+repository. The transfer inserts compare a single multi-row INSERT ...
+VALUES of the whole batch with the executemany of the click recorder's
+prebuilt INSERT, for several batch sizes. CPU is the time spent in this
+process, so the difference is what the app saves per request; wall time
+includes the round trip.
+"""
+import asyncio
+from datetime import datetime
+from functools import partial
+from ipaddress import ip_address
+from time import perf_counter, process_time
+
+from sqlalchemy import insert, select, update
+
+from benchmarks.common import db_argument_parser, make_engine
+from db.database import Base
+from models.short_link_model import Link, Transfer
+from services.click_recorder import TRANSFER_INSERT
+from services.short_link_crud import link_crud
+
+CLICK_BATCHES = (10, 100, 500, 1000)
+
+
+async def run(func, repeat: int) -> tuple[float, float]:
+    """Mean CPU and wall time of ``func`` in microseconds."""
+    for _ in range(10):
+        await func()
+    cpu, wall = process_time(), perf_counter()
+    for _ in range(repeat):
+        await func()
+    return (
+        (process_time() - cpu) / repeat * 1e6,
+        (perf_counter() - wall) / repeat * 1e6,
+    )
+
+
+async def link_rows(session_factory, repeat: int) -> dict[str, tuple]:
+    async with session_factory() as db:
+
+        async def orm_get():
+            statement = select(Link).where(Link.id == "bench")
+            (await db.execute(statement)).scalar_one_or_none()
+            db.expunge_all()
+
+        async def orm_update(**values):
+            link = (
+                await db.execute(select(Link).where(Link.id == "bench"))
+            ).scalar_one()
+            await db.execute(
+                update(Link).where(Link.id == link.id).values(**values)
+            )
+            await db.commit()
+            await db.refresh(link)
+            db.expunge_all()
+
+        async def core_get():
+            await link_crud.get(db, "bench")
+
+        async def core_update():
+            link = await link_crud.get(db, "bench")
+            await link_crud.update(
+                db, db_obj=link, obj_in={"original_url": "http://a.b"}
+            )
+
+        async def core_delete():
+            link = await link_crud.get(db, "bench")
+            await link_crud.delete(db, db_obj=link)
+
+        return {
+            "get by id": (
+                await run(orm_get, repeat),
+                await run(core_get, repeat),
+            ),
+            "update": (
+                await run(
+                    partial(orm_update, original_url="http://a.b"), repeat
+                ),
+                await run(core_update, repeat),
+            ),
+            "soft delete": (
+                await run(partial(orm_update, deleted=True), repeat),
+                await run(core_delete, repeat),
+            ),
+        }
+
+
+async def insert_rows(
+    session_factory, link_key: int, repeat: int
+) -> dict[str, tuple]:
+    rows = {}
+    for size in CLICK_BATCHES:
+        values = [
+            {
+                "client_host": ip_address("10.0.0.1"),
+                "link_key": link_key,
+                "date": datetime.utcnow(),
+            }
+            for _ in range(size)
+        ]
+
+        async def values_insert():
+            async with session_factory() as db:
+                await db.execute(insert(Transfer.__table__).values(values))
+                await db.commit()
+
+        async def executemany_insert():
+            async with session_factory() as db:
+                await db.execute(TRANSFER_INSERT, values)
+                await db.commit()
+
+        times = max(repeat * 10 // size, 1)
+        rows[f"insert {size} transfers"] = (
+            await run(values_insert, times),
+            await run(executemany_insert, times),
+        )
+    return rows
+
+
+async def main(dsn: str, repeat: int) -> None:
+    engine, session_factory = make_engine(dsn)
+    async with engine.begin() as connect:
+        await connect.run_sync(Base.metadata.create_all)
+    try:
+        async with session_factory() as db:
+            db.add(Link(id="bench", original_url="http://a.b"))
+            await db.commit()
+            key = await db.scalar(select(Link.key).where(Link.id == "bench"))
+        rows = await link_rows(session_factory, repeat)
+        rows.update(await insert_rows(session_factory, key, repeat))
+    finally:
+        async with engine.begin() as connect:
+            await connect.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    print(
+        f"{'case':<24}{'per call cpu':>14}{'prebuilt cpu':>14}"
+        f"{'per call wall':>15}{'prebuilt wall':>15}  (us)"
+    )
+    for name, (orm, core) in rows.items():
+        (orm_cpu, orm_wall), (core_cpu, core_wall) = orm, core
+        print(
+            f"{name:<24}{orm_cpu:>14.1f}{core_cpu:>14.1f}"
+            f"{orm_wall:>15.1f}{core_wall:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    args = db_argument_parser(__doc__).parse_args()
+    asyncio.run(main(args.dsn, args.repeat))
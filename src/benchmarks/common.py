@@ -0,0 +1,70 @@
+import argparse
+from time import perf_counter
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import (AsyncEngine, async_sessionmaker,
+                                    create_async_engine)
+
+from core.config import app_settings
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Latency summary in milliseconds for samples given in seconds."""
+    values = sorted(sample * 1000 for sample in samples)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+async def measure(
+    func: Callable[[], Awaitable[Any]], *, repeat: int, warmup: int = 10
+) -> list[float]:
+    for _ in range(warmup):
+        await func()
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        await func()
+        samples.append(perf_counter() - started)
+    return samples
+
+
+def print_table(title: str, rows: dict[str, dict[str, float]]) -> None:
+    print(title)
+    print(
+        f"{'case':<32}{'count':>8}{'mean':>10}{'p50':>10}"
+        f"{'p95':>10}{'p99':>10}  (ms)"
+    )
+    for name, row in rows.items():
+        print(
+            f"{name:<32}{row['count']:>8}{row['mean']:>10.3f}"
+            f"{row['p50']:>10.3f}{row['p95']:>10.3f}{row['p99']:>10.3f}"
+        )
+
+
+def db_argument_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--dsn",
+        default=app_settings.database_test_dsn,
+        help="Database to run against. Tables are created and dropped.",
+    )
+    parser.add_argument("--repeat", type=int, default=500)
+    return parser
+
+
+def make_engine(dsn: str) -> tuple[AsyncEngine, async_sessionmaker]:
+    engine = create_async_engine(dsn)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
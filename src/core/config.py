@@ -24,8 +24,91 @@ class AppSettings(BaseSettings):
     project_name: str = "ShortLink"
     project_host: str = "127.0.0.1"
     project_port: int = 8080
+    # Worker processes of server.py, 0 for one per available CPU core.
+    # More than one need LINK_CACHE_BACKEND=redis: a memory cache is only
+    # cleared in the worker that changed the link. Without it 0 means 1.
+    web_workers: int = 0
+    # Seconds a worker keeps serving after SIGTERM while reporting not
+    # ready, so that the load balancer stops sending it requests first.
+    shutdown_delay: float = 5.0
 
     short_link_length: int = 6
+    # "random" or "sequence", see services/id_generator.py
+    short_link_generator: str = "random"
+    short_link_block_size: int = 1000
+    short_link_max_attempts: int = 5
+
+    # Reuse the live link of an already shortened URL on create.
+    link_dedup: bool = False
+    link_dedup_filter_capacity: int = 1_000_000
+
+    # Most ids a single POST /shorten/resolve may ask for.
+    link_resolve_max_ids: int = 1000
+
+    # "memory" (per process) or "redis" (shared by all workers).
+    link_cache_backend: str = "memory"
+    link_cache_size: int = 10000
+    link_cache_ttl: float = 60.0
+    # How long a "not found" is cached.
+    link_cache_negative_ttl: float = 5.0
+    # Links with most transfers put into the cache at startup, 0 for none.
+    link_cache_warm_size: int = 1000
+
+    # Token bucket per client host: RATE requests per second on average,
+    # up to BURST at once. "memory" keeps the buckets per process, "redis"
+    # shares them between workers.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_max_clients: int = 100_000
+    rate_limit_create_rate: float = 5.0
+    rate_limit_create_burst: int = 20
+    rate_limit_bulk_rate: float = 0.5
+    rate_limit_bulk_burst: int = 5
+    rate_limit_transfer_rate: float = 20.0
+    rate_limit_transfer_burst: int = 100
+
+    # Cache-Control of link and status reads. They carry an ETag and
+    # Last-Modified, so clients and CDNs can revalidate them with a 304.
+    read_cache_control: str = "no-cache"
+    # Cache-Control of redirects, e.g. "public, max-age=86400". A redirect
+    # served from a cache does not reach the app and is not recorded.
+    redirect_cache_control: str = ""
+    # Answer 301 instead of 307. Browsers cache a 301 even without
+    # Cache-Control, so enable it only if links are never changed.
+    redirect_permanent: bool = False
+
+    redis_url: str = "redis://localhost:6379/0"
+    redis_max_connections: int = 10
+    redis_timeout: float = 0.5
+
+    # Monthly transfer partitions are created this many months ahead.
+    transfer_partitions_ahead: int = 3
+    # Partitions older than this many months are dropped or detached
+    # (renamed to transfer_archive_YYYYMM); 0 keeps them forever.
+    transfer_retention_months: int = 0
+    transfer_retention_action: str = "detach"
+    transfer_partition_check_interval: float = 3600.0
+
+    # Closed days of transfers are exported to TRANSFER_EXPORT_DIR as
+    # "parquet" or "arrow" files every TRANSFER_EXPORT_INTERVAL seconds
+    # (0 disables the export in the app, the CLI still works).
+    transfer_export_dir: str = "exports"
+    transfer_export_format: str = "parquet"
+    transfer_export_delay: float = 300.0
+    transfer_export_interval: float = 0.0
+
+    # Links deleted more than this many days ago are moved with their
+    # transfers to the archive tables every LINK_COMPACTION_INTERVAL
+    # seconds, in batches of at most LINK_COMPACTION_BATCH_SIZE links and
+    # about LINK_COMPACTION_TRANSFER_BATCH_SIZE transfers; 0 disables it.
+    link_compaction_after_days: int = 0
+    link_compaction_batch_size: int = 500
+    link_compaction_transfer_batch_size: int = 10000
+    link_compaction_interval: float = 3600.0
+
+    click_queue_size: int = 10000
+    click_batch_size: int = 500
+    click_flush_interval: float = 1.0
 
     database_dsn: PostgresDsn = parse_obj_as(
         PostgresDsn,
@@ -40,6 +123,19 @@ class AppSettings(BaseSettings):
         f"{db_set.postgres_port}/{db_set.postgres_db_test}"
     )
 
+    # JSON list of read replica DSNs, e.g. '["postgresql+asyncpg://..."]'
+    database_replica_dsns: list[str] = []
+    database_replica_retry_interval: float = 30.0
+    database_replica_check_interval: float = 10.0
+
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    # Seconds after which a connection is replaced, -1 to keep forever.
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_echo: bool = False
+
     class Config:
         env_file = dotenv_path
 
@@ -0,0 +1,135 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import Counter, Gauge, HistogramMetric, registry
+
+# Small bucket set for "number of queries per request".
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route template and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.register(
+    HistogramMetric(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        ("method", "route"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge(
+        "http_requests_in_flight",
+        "HTTP requests currently being served.",
+        ("method", "route"),
+    )
+)
+http_request_db_queries = registry.register(
+    HistogramMetric(
+        "http_request_db_queries",
+        "DB queries executed while serving one request.",
+        ("method", "route"),
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+)
+http_request_db_duration = registry.register(
+    HistogramMetric(
+        "http_request_db_duration_seconds",
+        "Time spent in DB queries while serving one request.",
+        ("method", "route"),
+    )
+)
+db_queries = registry.register(
+    Counter("db_queries_total", "DB queries executed by the process.")
+)
+db_query_duration = registry.register(
+    HistogramMetric("db_query_duration_seconds", "DB query latency.")
+)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+_request_queries: ContextVar[QueryStats | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the matching route, so ids do not make series."""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        labels = (scope["method"], route_template(scope))
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        queries = QueryStats()
+        token = _request_queries.set(queries)
+        http_requests_in_flight.inc(labels)
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(labels, perf_counter() - started)
+            http_requests_in_flight.dec(labels)
+            http_requests.inc(labels + (str(status_code),))
+            http_request_db_queries.observe(labels, queries.count)
+            http_request_db_duration.observe(labels, queries.duration)
+            _request_queries.reset(token)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count and time every statement executed through ``engine``."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, *args):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, *args):
+        duration = perf_counter() - conn.info["query_started"].pop()
+        db_queries.inc()
+        db_query_duration.observe((), duration)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.count += 1
+            queries.duration += duration
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("query_started")
+            if started:
+                started.pop()
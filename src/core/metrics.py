@@ -0,0 +1,157 @@
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+# Seconds, the usual latency buckets of Prometheus client libraries.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        cumulative = {}
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+LabelValues = tuple[str, ...]
+MetricType = TypeVar("MetricType", bound="Metric")
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+class Metric:
+    """A metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: LabelValues = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[LabelValues, Any] = {}
+
+    def _labels(self, values: LabelValues, extra: dict | None = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.extend(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def samples(self) -> Iterator[str]:
+        for values, value in self._values.items():
+            yield f"{self.name}{self._labels(values)} {value}"
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, labels: LabelValues, value: float) -> None:
+        self._values[labels] = value
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: LabelValues = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels: LabelValues, value: float) -> None:
+        histogram = self._values.get(labels)
+        if histogram is None:
+            histogram = self._values[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def set_histogram(self, labels: LabelValues, histogram: Histogram):
+        self._values[labels] = histogram
+
+    def samples(self) -> Iterator[str]:
+        for values, histogram in self._values.items():
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                labels = self._labels(values, {"le": bound})
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = self._labels(values)
+            yield f"{self.name}_sum{labels} {snapshot['sum']}"
+            yield f"{self.name}_count{labels} {snapshot['count']}"
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format.
+
+    Collectors are called on every scrape and return metrics built from
+    state that is tracked elsewhere (caches, queues, the DB pool).
+    """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: MetricType) -> MetricType:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return "\n".join(
+            line for metric in metrics for line in metric.render()
+        ) + "\n"
+
+
+registry = Registry()
@@ -5,6 +5,8 @@ from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
 from sqlalchemy.orm import declarative_base
 
 from core.config import app_settings
+from db.pool import InstrumentedAsyncPool
+from db.replicas import ReplicaRouter, is_connection_error
 
 
 async def get_session() -> AsyncSession:
@@ -12,6 +14,22 @@ async def get_session() -> AsyncSession:
         yield session
 
 
+async def get_read_session() -> AsyncSession:
+    """Session for read-only handlers: a healthy replica or the primary."""
+    replica = replica_router.choose()
+    if replica is None:
+        async with async_session() as session:
+            yield session
+        return
+    async with replica.session() as session:
+        try:
+            yield session
+        except Exception as error:
+            if is_connection_error(error):
+                replica.mark_down()
+            raise
+
+
 Base = declarative_base()
 if "pytest" in modules:
     base_dsn = app_settings.database_test_dsn
@@ -19,5 +37,27 @@ else:
     base_dsn = app_settings.database_dsn
 
 
-engine = create_async_engine(base_dsn, echo=True, future=True)
+engine = create_async_engine(
+    base_dsn,
+    echo=app_settings.db_echo,
+    future=True,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=app_settings.db_pool_size,
+    max_overflow=app_settings.db_max_overflow,
+    pool_timeout=app_settings.db_pool_timeout,
+    pool_recycle=app_settings.db_pool_recycle,
+    pool_pre_ping=app_settings.db_pool_pre_ping,
+)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+replica_router = ReplicaRouter.from_dsns(
+    [] if "pytest" in modules else app_settings.database_replica_dsns,
+    retry_interval=app_settings.database_replica_retry_interval,
+    check_interval=app_settings.database_replica_check_interval,
+    echo=app_settings.db_echo,
+    pool_size=app_settings.db_pool_size,
+    max_overflow=app_settings.db_max_overflow,
+    pool_timeout=app_settings.db_pool_timeout,
+    pool_recycle=app_settings.db_pool_recycle,
+    pool_pre_ping=app_settings.db_pool_pre_ping,
+)
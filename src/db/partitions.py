@@ -0,0 +1,239 @@
+"""Monthly range partitions of the transfer table.
+
+Usage: python -m db.partitions [--dry-run]
+
+Creates the partitions of the current and the next
+TRANSFER_PARTITIONS_AHEAD months and drops or detaches the ones older than
+TRANSFER_RETENTION_MONTHS. The app runs the same maintenance at startup
+and every TRANSFER_PARTITION_CHECK_INTERVAL seconds.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from core.config import app_settings
+from db.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT = "transfer"
+PARTITION_PREFIX = "transfer_p"
+ARCHIVE_PREFIX = "transfer_archive_"
+RETENTION_ACTIONS = ("drop", "detach")
+# Key of the advisory lock that keeps workers from maintaining at once.
+MAINTENANCE_LOCK_KEY = 7_406_513
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> date | None:
+    suffix = name.removeprefix(PARTITION_PREFIX)
+    if suffix == name or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+async def list_partitions(connection: AsyncConnection) -> dict[str, date]:
+    """Monthly partitions attached to the transfer table by their month."""
+    results = await connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": PARENT},
+    )
+    partitions = {}
+    for (name,) in results:
+        month = partition_month(name)
+        if month is not None:
+            partitions[name] = month
+    return partitions
+
+
+async def create_partition(connection: AsyncConnection, month: date) -> None:
+    """Attach the partition of ``month``.
+
+    Rows of that month already in the default partition are moved into
+    the new table before it is attached, otherwise attaching would fail.
+    """
+    name = partition_name(month)
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    await connection.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    await connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {PARENT}_default "
+            f"WHERE date >= '{start}' AND date < '{end}' RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        )
+    )
+    await connection.execute(
+        text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    )
+
+
+async def remove_partition(
+    connection: AsyncConnection, name: str, action: str
+) -> None:
+    if action == "drop":
+        await connection.execute(text(f"DROP TABLE {name}"))
+        return
+    archive = name.replace(PARTITION_PREFIX, ARCHIVE_PREFIX, 1)
+    await connection.execute(
+        text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+    )
+    await connection.execute(text(f"ALTER TABLE {name} RENAME TO {archive}"))
+    await drop_foreign_keys(connection, archive)
+
+
+async def drop_foreign_keys(connection: AsyncConnection, table: str) -> None:
+    """Drop the foreign keys a detached partition keeps.
+
+    Otherwise its transfers would still block deleting their links, see
+    services.compaction.
+    """
+    names = await connection.scalars(
+        text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ),
+        {"table": table},
+    )
+    for constraint in names.all():
+        await connection.execute(
+            text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"')
+        )
+
+
+async def maintain_partitions(
+    connection: AsyncConnection,
+    *,
+    today: date,
+    ahead: int,
+    retention_months: int,
+    action: str,
+    dry_run: bool = False,
+) -> dict[str, list[str]] | None:
+    """Create missing and remove expired partitions in one transaction.
+
+    Returns the names of the created and removed partitions, or ``None``
+    if another process is maintaining the partitions right now.
+    """
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action: {action}")
+    locked = await connection.scalar(
+        text("SELECT pg_try_advisory_xact_lock(:key)"),
+        {"key": MAINTENANCE_LOCK_KEY},
+    )
+    if not locked:
+        return None
+    existing = await list_partitions(connection)
+    current = date(today.year, today.month, 1)
+    missing = [
+        month
+        for month in (add_months(current, n) for n in range(ahead + 1))
+        if partition_name(month) not in existing
+    ]
+    expired = []
+    if retention_months > 0:
+        cutoff = add_months(current, -retention_months)
+        expired = sorted(
+            name for name, month in existing.items() if month < cutoff
+        )
+    if not dry_run:
+        for month in missing:
+            await create_partition(connection, month)
+        for name in expired:
+            await remove_partition(connection, name, action)
+    return {
+        "created": [partition_name(month) for month in missing],
+        action: expired,
+    }
+
+
+class PartitionMaintainer:
+    """Runs ``maintain_partitions`` with the app settings periodically."""
+
+    def __init__(self, engine: AsyncEngine, *, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self, *, dry_run: bool = False) -> dict | None:
+        async with self.engine.begin() as connection:
+            return await maintain_partitions(
+                connection,
+                today=datetime.utcnow().date(),
+                ahead=app_settings.transfer_partitions_ahead,
+                retention_months=app_settings.transfer_retention_months,
+                action=app_settings.transfer_retention_action,
+                dry_run=dry_run,
+            )
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                changes = await self.run_once()
+            except Exception:
+                logger.exception("Transfer partition maintenance failed")
+            else:
+                if changes and any(changes.values()):
+                    logger.info("Transfer partitions changed: %s", changes)
+            await asyncio.sleep(self.interval)
+
+
+partition_maintainer = PartitionMaintainer(
+    engine, interval=app_settings.transfer_partition_check_interval
+)
+
+
+async def main(dry_run: bool) -> None:
+    try:
+        changes = await partition_maintainer.run_once(dry_run=dry_run)
+    finally:
+        await engine.dispose()
+    if changes is None:
+        print("Maintenance is running in another process")
+        return
+    for key, names in changes.items():
+        print(f"{key}: {', '.join(names) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print what would be created and removed.",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
@@ -0,0 +1,44 @@
+from time import perf_counter
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.metrics import Histogram
+
+
+class PoolStats:
+    def __init__(self):
+        self.waiting = 0
+        self.timeouts = 0
+        self.checkout_latency = Histogram()
+
+
+# Module level, so that the statistics survive ``Pool.recreate``.
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def connect(self):
+        pool_stats.waiting += 1
+        started = perf_counter()
+        try:
+            return super().connect()
+        except TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.waiting -= 1
+            pool_stats.checkout_latency.observe(perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "waiting": pool_stats.waiting,
+            "timeouts": pool_stats.timeouts,
+            "checkout_latency": pool_stats.checkout_latency.snapshot(),
+        }
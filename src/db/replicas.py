@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from time import monotonic
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import (AsyncEngine, async_sessionmaker,
+                                    create_async_engine)
+
+logger = logging.getLogger(__name__)
+
+
+def is_connection_error(error: Exception) -> bool:
+    if isinstance(error, (OSError, InterfaceError, OperationalError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine, retry_interval: float):
+        self.engine = engine
+        self.session = async_sessionmaker(engine, expire_on_commit=False)
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return monotonic() >= self._down_until
+
+    def mark_down(self) -> None:
+        if self.healthy:
+            logger.warning(
+                "Replica %s is unavailable for %s s",
+                self.engine.url.render_as_string(hide_password=True),
+                self.retry_interval,
+            )
+        self._down_until = monotonic() + self.retry_interval
+
+    def mark_up(self) -> None:
+        self._down_until = 0.0
+
+    async def ping(self) -> bool:
+        try:
+            async with self.engine.connect() as connect:
+                await connect.execute(text("SELECT 1"))
+        except Exception:
+            self.mark_down()
+            return False
+        self.mark_up()
+        return True
+
+
+class ReplicaRouter:
+    """Round-robin over healthy read replicas.
+
+    Replicas are taken out of rotation for ``retry_interval`` seconds when a
+    request fails with a connection error or an active check fails. With no
+    healthy replica ``choose`` returns ``None`` and reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        replicas: list[Replica],
+        *,
+        check_interval: float,
+    ):
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self._next = 0
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_dsns(
+        cls,
+        dsns: list[str],
+        *,
+        retry_interval: float,
+        check_interval: float,
+        **engine_kwargs,
+    ) -> "ReplicaRouter":
+        replicas = [
+            Replica(create_async_engine(dsn, **engine_kwargs), retry_interval)
+            for dsn in dsns
+        ]
+        return cls(replicas, check_interval=check_interval)
+
+    def choose(self) -> Replica | None:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check(self) -> None:
+        await asyncio.gather(*(replica.ping() for replica in self.replicas))
+
+    async def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+            }
+            for replica in self.replicas
+        ]
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
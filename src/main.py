@@ -1,9 +1,43 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
+from api import metrics_api
 from api.v1 import base_api
 from core.config import app_settings
+from core.instrumentation import MetricsMiddleware, instrument_engine
+from db.database import engine, replica_router
+from db.partitions import partition_maintainer
+from services.click_recorder import click_recorder
+from services.compaction import link_compactor
+from services.export import transfer_exporter
+from services.lifecycle import dispose, warm_up, worker_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await click_recorder.start()
+    await replica_router.start()
+    await partition_maintainer.start()
+    await transfer_exporter.start()
+    await link_compactor.start()
+    await warm_up()
+    worker_state.ready = True
+    try:
+        yield
+    finally:
+        worker_state.ready = False
+        await link_compactor.stop()
+        await transfer_exporter.stop()
+        await partition_maintainer.stop()
+        # Writes out the clicks still queued.
+        await click_recorder.stop()
+        await replica_router.stop()
+        await dispose()
+
 
 app = FastAPI(
     title=app_settings.project_name,
@@ -12,12 +46,19 @@ app = FastAPI(
     # Адрес документации в формате OpenAPI
     openapi_url="/api/openapi.json",
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.include_router(base_api.api_router, prefix="/api/v1")
+app.include_router(metrics_api.router_metrics)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+for replica in replica_router.replicas:
+    instrument_engine(replica.engine)
 
 
 if __name__ == "__main__":
+    # Development server, see server.py for production.
     uvicorn.run(
         "main:app",
         host=app_settings.project_host,
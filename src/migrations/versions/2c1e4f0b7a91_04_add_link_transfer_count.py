@@ -0,0 +1,46 @@
+"""04_add_link_transfer_count
+
+Revision ID: 2c1e4f0b7a91
+Revises: 812eae4d9710
+Create Date: 2026-10-18 12:05:41.318904
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2c1e4f0b7a91"
+down_revision = "812eae4d9710"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "link",
+        sa.Column(
+            "transfer_count",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        op.f("ix_transfer_link_id"), "transfer", ["link_id"], unique=False
+    )
+    op.execute(
+        """
+        UPDATE link SET transfer_count = counts.transfer_count
+        FROM (
+            SELECT link_id, count(*) AS transfer_count
+            FROM transfer
+            GROUP BY link_id
+        ) AS counts
+        WHERE link.id = counts.link_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_transfer_link_id"), table_name="transfer")
+    op.drop_column("link", "transfer_count")
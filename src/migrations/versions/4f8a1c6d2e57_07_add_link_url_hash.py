@@ -0,0 +1,33 @@
+"""07_add_link_url_hash
+
+Revision ID: 4f8a1c6d2e57
+Revises: e6a0d4b18c3f
+Create Date: 2026-10-18 16:30:02.114583
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f8a1c6d2e57"
+down_revision = "e6a0d4b18c3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "link", sa.Column("url_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        "ix_link_url_hash",
+        "link",
+        ["url_hash"],
+        unique=True,
+        postgresql_where=sa.text("deleted IS NOT TRUE"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_link_url_hash", table_name="link")
+    op.drop_column("link", "url_hash")
@@ -0,0 +1,45 @@
+"""05_add_transfer_rollup_table
+
+Revision ID: 9b3d27c5e8f4
+Revises: 2c1e4f0b7a91
+Create Date: 2026-10-18 13:41:09.524716
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b3d27c5e8f4"
+down_revision = "2c1e4f0b7a91"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "transfer_rollup",
+        sa.Column("link_id", sa.String(), nullable=False),
+        sa.Column("granularity", sa.String(length=6), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["link_id"],
+            ["link.id"],
+        ),
+        sa.PrimaryKeyConstraint("link_id", "granularity", "bucket"),
+    )
+    for granularity in ("minute", "hour", "day"):
+        op.execute(
+            f"""
+            INSERT INTO transfer_rollup (link_id, granularity, bucket, count)
+            SELECT link_id, '{granularity}', date_trunc('{granularity}', date),
+                   count(*)
+            FROM transfer
+            WHERE link_id IS NOT NULL AND date IS NOT NULL
+            GROUP BY link_id, date_trunc('{granularity}', date)
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("transfer_rollup")
@@ -0,0 +1,35 @@
+"""12_drop_archived_partition_fkeys
+
+Revision ID: a8e3c5f17d92
+Revises: f2c7a9d04b61
+Create Date: 2026-10-18 23:58:06.214870
+
+A detached transfer partition kept its foreign key to link, so deleting a
+link that still has transfers there failed. db.partitions now drops it on
+detach; this drops it from the transfer_archive_* tables detached before.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a8e3c5f17d92"
+down_revision = "f2c7a9d04b61"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    constraints = op.get_bind().execute(
+        sa.text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "JOIN pg_class ON pg_class.oid = pg_constraint.conrelid "
+            "WHERE contype = 'f' AND relname LIKE 'transfer\\_archive\\_%'"
+        )
+    )
+    for table, name in constraints.all():
+        op.drop_constraint(name, table, type_="foreignkey")
+
+
+def downgrade() -> None:
+    # The archived transfers may refer to links compacted since.
+    pass
@@ -0,0 +1,128 @@
+"""08_partition_transfer_table
+
+Revision ID: b7d2e9a4c1f6
+Revises: 4f8a1c6d2e57
+Create Date: 2026-10-18 19:40:27.503318
+
+Turns transfer into a table range partitioned by month on date. The rows
+are copied into the new table, so on a large table run it in a maintenance
+window. Partitions for the months of the existing rows and the next
+PARTITIONS_AHEAD months are created here, later ones by db.partitions.
+"""
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d2e9a4c1f6"
+down_revision = "4f8a1c6d2e57"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 3
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("ALTER SEQUENCE transfer_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE transfer_id_seq AS bigint")
+    op.rename_table("transfer", "transfer_old")
+    op.create_table(
+        "transfer",
+        sa.Column(
+            "id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('transfer_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("client_host", sa.String(length=40), nullable=True),
+        sa.Column("link_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["link_id"], ["link.id"], name="transfer_link_id_fkey_p"
+        ),
+        sa.PrimaryKeyConstraint("id", "date", name="transfer_pkey_p"),
+        postgresql_partition_by="RANGE (date)",
+    )
+    op.execute("ALTER SEQUENCE transfer_id_seq OWNED BY transfer.id")
+    op.execute("CREATE TABLE transfer_default PARTITION OF transfer DEFAULT")
+
+    # Rows without a date are kept in the default partition as 'epoch'.
+    first = op.get_bind().scalar(
+        sa.text("SELECT min(date) FROM transfer_old WHERE date > 'epoch'")
+    )
+    current = datetime.utcnow().date().replace(day=1)
+    month = min(first.date(), current).replace(day=1) if first else current
+    while month <= add_months(current, PARTITIONS_AHEAD):
+        end = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transfer_p{month:%Y%m} PARTITION OF transfer "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+        month = end
+
+    op.execute(
+        "INSERT INTO transfer (id, date, client_host, link_id) "
+        "SELECT id, coalesce(date, 'epoch'), client_host, link_id "
+        "FROM transfer_old"
+    )
+    op.drop_table("transfer_old")
+    op.execute(
+        "ALTER TABLE transfer RENAME CONSTRAINT transfer_pkey_p "
+        "TO transfer_pkey"
+    )
+    op.execute(
+        "ALTER TABLE transfer RENAME CONSTRAINT transfer_link_id_fkey_p "
+        "TO transfer_link_id_fkey"
+    )
+    op.create_index(
+        "ix_transfer_link_id_date", "transfer", ["link_id", "date"]
+    )
+
+
+def downgrade() -> None:
+    # Partitions detached by retention are not brought back.
+    op.execute("ALTER SEQUENCE transfer_id_seq OWNED BY NONE")
+    op.rename_table("transfer", "transfer_partitioned")
+    op.create_table(
+        "transfer",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('transfer_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("date", sa.DateTime(), nullable=True),
+        sa.Column("client_host", sa.String(length=40), nullable=True),
+        sa.Column("link_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["link_id"], ["link.id"], name="transfer_link_id_fkey_old"
+        ),
+        sa.PrimaryKeyConstraint("id", name="transfer_pkey_old"),
+    )
+    op.execute(
+        "INSERT INTO transfer (id, date, client_host, link_id) "
+        "SELECT id, date, client_host, link_id FROM transfer_partitioned"
+    )
+    op.drop_table("transfer_partitioned")
+    op.execute("ALTER SEQUENCE transfer_id_seq AS integer")
+    op.execute("ALTER SEQUENCE transfer_id_seq OWNED BY transfer.id")
+    op.execute(
+        "ALTER TABLE transfer RENAME CONSTRAINT transfer_pkey_old "
+        "TO transfer_pkey"
+    )
+    op.execute(
+        "ALTER TABLE transfer RENAME CONSTRAINT transfer_link_id_fkey_old "
+        "TO transfer_link_id_fkey"
+    )
+    op.create_index(
+        op.f("ix_transfer_date"), "transfer", ["date"], unique=False
+    )
+    op.create_index(
+        op.f("ix_transfer_link_id"), "transfer", ["link_id"], unique=False
+    )
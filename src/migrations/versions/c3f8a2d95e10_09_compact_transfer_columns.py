@@ -0,0 +1,73 @@
+"""09_compact_transfer_columns
+
+Revision ID: c3f8a2d95e10
+Revises: b7d2e9a4c1f6
+Create Date: 2026-10-18 20:31:52.640127
+
+Transfers refer to links by a new integer link.key instead of the string
+id and store client_host as inet. Both changes rewrite the transfer table.
+Partitions detached by retention keep the old columns.
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "c3f8a2d95e10"
+down_revision = "b7d2e9a4c1f6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "link",
+        sa.Column("key", sa.Integer(), sa.Identity(), nullable=False),
+    )
+    op.create_unique_constraint("link_key_key", "link", ["key"])
+
+    op.add_column("transfer", sa.Column("link_key", sa.Integer()))
+    op.execute(
+        "UPDATE transfer SET link_key = link.key "
+        "FROM link WHERE link.id = transfer.link_id"
+    )
+    op.alter_column(
+        "transfer",
+        "client_host",
+        type_=postgresql.INET(),
+        postgresql_using="client_host::inet",
+    )
+    op.drop_index("ix_transfer_link_id_date", table_name="transfer")
+    op.drop_constraint("transfer_link_id_fkey", "transfer")
+    op.drop_column("transfer", "link_id")
+    op.create_foreign_key(
+        "transfer_link_key_fkey", "transfer", "link", ["link_key"], ["key"]
+    )
+    op.create_index(
+        "ix_transfer_link_key_date", "transfer", ["link_key", "date"]
+    )
+
+
+def downgrade() -> None:
+    op.add_column("transfer", sa.Column("link_id", sa.String()))
+    op.execute(
+        "UPDATE transfer SET link_id = link.id "
+        "FROM link WHERE link.key = transfer.link_key"
+    )
+    op.alter_column(
+        "transfer",
+        "client_host",
+        type_=sa.String(length=40),
+        postgresql_using="host(client_host)",
+    )
+    op.drop_index("ix_transfer_link_key_date", table_name="transfer")
+    op.drop_constraint("transfer_link_key_fkey", "transfer")
+    op.drop_column("transfer", "link_key")
+    op.create_foreign_key(
+        "transfer_link_id_fkey", "transfer", "link", ["link_id"], ["id"]
+    )
+    op.create_index(
+        "ix_transfer_link_id_date", "transfer", ["link_id", "date"]
+    )
+    op.drop_constraint("link_key_key", "link")
+    op.drop_column("link", "key")
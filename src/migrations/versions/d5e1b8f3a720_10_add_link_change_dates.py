@@ -0,0 +1,46 @@
+"""10_add_link_change_dates
+
+Revision ID: d5e1b8f3a720
+Revises: c3f8a2d95e10
+Create Date: 2026-10-18 21:47:10.382946
+
+Adds link.updated_at and link.last_transfer_at, the Last-Modified of link
+and status reads. Existing links are backfilled from created_at and from
+the latest transfer.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d5e1b8f3a720"
+down_revision = "c3f8a2d95e10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "link",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("timezone('utc', now())"),
+            nullable=False,
+        ),
+    )
+    op.add_column("link", sa.Column("last_transfer_at", sa.DateTime()))
+    op.execute(
+        "UPDATE link SET updated_at = created_at "
+        "WHERE created_at IS NOT NULL"
+    )
+    op.execute(
+        "UPDATE link SET last_transfer_at = last.date "
+        "FROM (SELECT link_key, max(date) AS date FROM transfer "
+        "GROUP BY link_key) AS last "
+        "WHERE link.key = last.link_key"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("link", "last_transfer_at")
+    op.drop_column("link", "updated_at")
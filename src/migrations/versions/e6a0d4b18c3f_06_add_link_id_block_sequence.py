@@ -0,0 +1,23 @@
+"""06_add_link_id_block_sequence
+
+Revision ID: e6a0d4b18c3f
+Revises: 9b3d27c5e8f4
+Create Date: 2026-10-18 15:12:47.870215
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e6a0d4b18c3f"
+down_revision = "9b3d27c5e8f4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence("link_id_block_seq")))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence("link_id_block_seq")))
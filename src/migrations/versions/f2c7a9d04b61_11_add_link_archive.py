@@ -0,0 +1,75 @@
+"""11_add_link_archive
+
+Revision ID: f2c7a9d04b61
+Revises: d5e1b8f3a720
+Create Date: 2026-10-18 23:12:41.528310
+
+Adds partial indexes on live and on deleted links and the archive tables
+that services.compaction moves long-deleted links and their transfers to.
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "f2c7a9d04b61"
+down_revision = "d5e1b8f3a720"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_link_live_created_at_id",
+        "link",
+        ["created_at", "id"],
+        postgresql_where=sa.text("deleted IS NOT TRUE"),
+    )
+    op.create_index(
+        "ix_link_deleted_updated_at",
+        "link",
+        ["updated_at"],
+        postgresql_where=sa.text("deleted IS TRUE"),
+    )
+    op.create_table(
+        "archived_link",
+        sa.Column("id", sa.String(length=12), nullable=False),
+        sa.Column("key", sa.Integer(), nullable=False),
+        sa.Column("original_url", sa.String(length=100), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("transfer_count", sa.Integer(), nullable=False),
+        sa.Column("last_transfer_at", sa.DateTime(), nullable=True),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(),
+            server_default=sa.text("timezone('utc', now())"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key"),
+    )
+    op.create_table(
+        "archived_transfer",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("client_host", postgresql.INET(), nullable=True),
+        sa.Column("link_key", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "date"),
+    )
+    op.create_index(
+        op.f("ix_archived_transfer_link_key"),
+        "archived_transfer",
+        ["link_key"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_archived_transfer_link_key"), table_name="archived_transfer"
+    )
+    op.drop_table("archived_transfer")
+    op.drop_table("archived_link")
+    op.drop_index("ix_link_deleted_updated_at", table_name="link")
+    op.drop_index("ix_link_live_created_at_id", table_name="link")
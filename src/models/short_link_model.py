@@ -1,47 +1,150 @@
 from datetime import datetime
-from random import choice
+from random import choices
 
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, String,
-                        func, select)
-from sqlalchemy.orm import column_property, relationship
+from sqlalchemy import (DDL, BigInteger, Boolean, Column, DateTime, ForeignKey,
+                        Identity, Index, Integer, Sequence, String, event,
+                        text)
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.orm import relationship
 
 from core.config import app_settings
 from db.database import Base
 
+SHORT_LINK_ALPHABET = "2345679abcdefghijkmnopqrstuvwxyzABCEFGHJKLMNPRSTUVWXYZ"
+
+# Each value hands out a block of ids to SequenceIdGenerator.
+link_id_block_seq = Sequence("link_id_block_seq", metadata=Base.metadata)
+
 
 def generate_short_link():
-    string = "2345679abcdefghijkmnopqrstuvwxyzABCEFGHJKLMNPRSTUVWXYZ"
     return "".join(
-        choice(string) for _ in range(app_settings.short_link_length)
+        choices(SHORT_LINK_ALPHABET, k=app_settings.short_link_length)
     )
 
 
 class Transfer(Base):
+    """Click log, range partitioned by month on ``date``.
+
+    Monthly partitions are managed by ``db.partitions``; rows outside of
+    them land in the default partition.
+    """
+
     __tablename__ = "transfer"
-    id = Column(Integer, primary_key=True)
-    date = Column(DateTime, index=True, default=datetime.utcnow)
-    client_host = Column(String(40))
-    link_id = Column(String, ForeignKey("link.id"))
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    date = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    client_host = Column(INET)
+    link_key = Column(Integer, ForeignKey("link.key"))
 
     link = relationship("Link", back_populates="transfer")
 
+    __table_args__ = (
+        Index("ix_transfer_link_key_date", "link_key", "date"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+
+
+event.listen(
+    Transfer.__table__,
+    "after_create",
+    DDL("CREATE TABLE transfer_default PARTITION OF transfer DEFAULT"),
+)
+
 
 class Link(Base):
     __tablename__ = "link"
     id = Column(String(12), primary_key=True, default=generate_short_link)
+    # Compact surrogate referenced by the transfer rows.
+    key = Column(Integer, Identity(), nullable=False, unique=True)
     original_url = Column(String(100), nullable=False)
     created_at = Column(DateTime, index=True, default=datetime.utcnow)
+    # Last change of the link itself; clicks only touch the columns below.
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        server_default=text("timezone('utc', now())"),
+    )
     deleted = Column(Boolean, default=False)
+    # Maintained by the click recorder together with the transfer inserts.
+    transfer_count = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    # When clicks were last written, which is later than they happened.
+    last_transfer_at = Column(DateTime)
+    # Hash of the normalized original_url, set only for links created in
+    # dedup mode: at most one live link is canonical for every URL.
+    url_hash = Column(String(64))
 
+    # Transfers are read in pages through RepositoryTransfer, never
+    # together with the link.
     transfer = relationship(
         "Transfer",
         cascade="all, delete",
         back_populates="link",
-        lazy="selectin",
+        lazy="raise",
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_link_url_hash",
+            "url_hash",
+            unique=True,
+            postgresql_where=text("deleted IS NOT TRUE"),
+        ),
+        # Live-only listing in the order of RepositoryLink.cursor_columns.
+        Index(
+            "ix_link_live_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("deleted IS NOT TRUE"),
+        ),
+        # Tombstones in the order they are compacted.
+        Index(
+            "ix_link_deleted_updated_at",
+            "updated_at",
+            postgresql_where=text("deleted IS TRUE"),
+        ),
     )
 
-    transfer_count = column_property(
-        select(func.count(Transfer.id))
-        .filter(Transfer.link_id == id)
-        .scalar_subquery()
+
+class TransferRollup(Base):
+    """Number of transfers of a link per time bucket."""
+
+    __tablename__ = "transfer_rollup"
+    link_id = Column(String, ForeignKey("link.id"), primary_key=True)
+    granularity = Column(String(6), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ArchivedLink(Base):
+    """Link deleted long ago, moved out of ``link`` by the compaction.
+
+    Its id is never handed out again and still resolves as removed.
+    """
+
+    __tablename__ = "archived_link"
+    id = Column(String(12), primary_key=True)
+    key = Column(Integer, nullable=False, unique=True)
+    original_url = Column(String(100), nullable=False)
+    created_at = Column(DateTime)
+    # When the link was deleted or last changed after that.
+    updated_at = Column(DateTime, nullable=False)
+    transfer_count = Column(Integer, nullable=False)
+    last_transfer_at = Column(DateTime)
+    archived_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=text("timezone('utc', now())"),
     )
+
+
+class ArchivedTransfer(Base):
+    """Transfers of the archived links."""
+
+    __tablename__ = "archived_transfer"
+    id = Column(BigInteger, primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    client_host = Column(INET)
+    link_key = Column(Integer, nullable=False, index=True)
@@ -1,6 +1,7 @@
 from datetime import datetime
+from enum import Enum
 
-from pydantic import (BaseModel, HttpUrl, IPvAnyAddress, root_validator,
+from pydantic import (BaseModel, Field, HttpUrl, IPvAnyAddress, root_validator,
                       validator)
 
 from core.config import app_settings
@@ -39,18 +40,39 @@ class LinkInDBBase(LinkBase):
         orm_mode = True
 
 
+SHORT_LINK_PREFIX = (
+    f"http://{app_settings.project_host}:{app_settings.project_port}/"
+)
+
+
 class Link(LinkInDBBase):
     short_link_full: str = ""
 
     @root_validator()
     @classmethod
     def validate_atts(cls, values):
-        id = values.get("id")
-        host = f"{app_settings.project_host}:{app_settings.project_port}"
-        values["short_link_full"] = f"http://{host}/{id}"
+        values["short_link_full"] = f"{SHORT_LINK_PREFIX}{values.get('id')}"
         return values
 
 
+class LinkBulkResult(BaseModel):
+    index: int
+    created: bool
+    link: Link | None = None
+    detail: str | None = None
+
+
+class LinkResolve(BaseModel):
+    ids: list[str] = Field(..., max_items=app_settings.link_resolve_max_ids)
+
+
+class LinkResolved(BaseModel):
+    id: str
+    original_url: str | None = None
+    deleted: bool | None = None
+    missing: bool = False
+
+
 class TransferBase(BaseModel):
     client_host: IPvAnyAddress
     link_id: str
@@ -92,3 +114,38 @@ class StatusBase(Link):
 
 class StatusFullBase(Link):
     transfer: list[TransferStatus] = []
+
+
+class Granularity(str, Enum):
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+
+    def truncate(self, date: datetime) -> datetime:
+        """Start of the bucket that ``date`` belongs to."""
+        date = date.replace(second=0, microsecond=0)
+        if self is not Granularity.minute:
+            date = date.replace(minute=0)
+        if self is Granularity.day:
+            date = date.replace(hour=0)
+        return date
+
+
+class StatsBucket(BaseModel):
+    bucket: datetime
+    count: int
+
+    class Config:
+        orm_mode = True
+
+
+class LinkStats(BaseModel):
+    id: str
+    granularity: Granularity
+    date_from: datetime = Field(alias="from")
+    date_to: datetime = Field(alias="to")
+    total: int
+    buckets: list[StatsBucket]
+
+    class Config:
+        allow_population_by_field_name = True
@@ -0,0 +1,106 @@
+"""Production server: uvicorn workers sharing one listening socket.
+
+Usage: python server.py [--workers N] [--host HOST] [--port PORT]
+
+WEB_WORKERS=0 (the default) starts one worker per available CPU core if
+the link cache is shared (LINK_CACHE_BACKEND=redis), otherwise one.
+Every worker warms up its pools and caches before it reports ready at
+``/api/v1/service/ready``. On SIGTERM a worker reports not ready, keeps
+serving for SHUTDOWN_DELAY seconds so that the load balancer stops sending
+it requests, then stops accepting connections, finishes the requests in
+flight, writes out the queued clicks and disposes the engines. A second
+SIGTERM or a SIGINT skips the delay.
+"""
+import argparse
+import asyncio
+import os
+import signal
+from types import FrameType
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from core.config import app_settings
+from services.lifecycle import worker_state
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(workers: int) -> int:
+    """Number of workers to start for WEB_WORKERS=``workers``.
+
+    The memory link cache is per process: a change would only clear it in
+    the worker that made it, and the others would serve the old link for
+    up to LINK_CACHE_TTL. So without a shared cache the default is one
+    worker, and more are refused.
+    """
+    shared = (
+        app_settings.link_cache_backend != "memory"
+        or app_settings.link_cache_size <= 0
+    )
+    if workers == 0:
+        return available_cores() if shared else 1
+    if workers > 1 and not shared:
+        raise SystemExit(
+            "Several workers need LINK_CACHE_BACKEND=redis "
+            "(or LINK_CACHE_SIZE=0)"
+        )
+    return workers
+
+
+class GracefulServer(uvicorn.Server):
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        delay = app_settings.shutdown_delay
+        if sig != signal.SIGTERM or worker_state.draining or delay <= 0:
+            super().handle_exit(sig, frame)
+            return
+        worker_state.draining = True
+        # Called by the event loop, see Server.install_signal_handlers.
+        asyncio.get_running_loop().call_later(
+            delay, super().handle_exit, sig, frame
+        )
+
+
+class GracefulMultiprocess(Multiprocess):
+    def shutdown(self) -> None:
+        # Multiprocess stops the workers one by one, so each would wait
+        # for the previous one's delay. Signal them all first.
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        super().shutdown()
+
+
+def main(host: str, port: int, workers: int) -> None:
+    config = uvicorn.Config(
+        "main:app",
+        host=host,
+        port=port,
+        workers=worker_count(workers),
+        lifespan="on",
+    )
+    server = GracefulServer(config)
+    if config.workers == 1:
+        server.run()
+        return
+    sock = config.bind_socket()
+    GracefulMultiprocess(config, target=server.run, sockets=[sock]).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=app_settings.project_host)
+    parser.add_argument(
+        "--port", type=int, default=app_settings.project_port
+    )
+    parser.add_argument(
+        "--workers", type=int, default=app_settings.web_workers
+    )
+    args = parser.parse_args()
+    main(args.host, args.port, args.workers)
@@ -1,15 +1,32 @@
 from abc import ABC
+from functools import cached_property
 from typing import Any, Generic, Type, TypeVar
 
 from asyncpg.exceptions import UniqueViolationError
 from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import insert, select, update
+from sqlalchemy import (Row, Select, Update, and_, any_, bindparam, insert,
+                        select, tuple_, update)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.database import Base
+from services.pagination import decode_cursor, encode_cursor
+
+# Rows per INSERT statement, well below the 32767 bind parameters limit.
+BULK_CHUNK_SIZE = 1000
+
+
+def any_of(column: Any, name: str) -> Any:
+    """``column = ANY(:name)``, the parameter being a list of values.
+
+    Unlike IN the SQL does not depend on the number of values, so asyncpg
+    prepares the statement once for lists of any length.
+    """
+    return column == any_(bindparam(name, type_=ARRAY(column.type)))
+
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -36,8 +53,13 @@ class Repository(ABC):
 class RepositoryDB(
     Repository, Generic[ModelType, CreateSchemaType, UpdateSchemaType]
 ):
+    # Columns that define the listing order and the keyset cursor.
+    cursor_columns: tuple[str, ...] = ("id",)
+
     def __init__(self, model: Type[ModelType]):
         self._model = model
+        # Listing statements by (live only, keyset cursor).
+        self._page_statements: dict[tuple[bool, bool], Select] = {}
 
     async def ping(self, db: AsyncSession) -> bool:
         statement = select(self._model).limit(1)
@@ -47,17 +69,96 @@ class RepositoryDB(
             return False
         return True
 
-    async def get(self, db: AsyncSession, id: int | str) -> ModelType | None:
-        statement = select(self._model).where(self._model.id == id)
-        results = await db.execute(statement=statement)
-        return results.scalar_one_or_none()
+    # The statements of the hot operations are built once and executed
+    # with bind parameters: building one costs more CPU than running it,
+    # and the same statement object hits SQLAlchemy's compiled cache and
+    # asyncpg's prepared statements every time. Their rows are returned
+    # as they are, without ORM hydration.
+
+    @cached_property
+    def _get_statement(self) -> Select:
+        table = self._model.__table__
+        return select(table).where(table.c.id == bindparam("b_id"))
+
+    @cached_property
+    def _update_statement(self) -> Update:
+        # Without .values() the SET clause comes from the parameters.
+        table = self._model.__table__
+        return (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .returning(*table.c)
+        )
+
+    @cached_property
+    def _delete_statement(self) -> Update:
+        return self._update_statement.values(deleted=True)
+
+    async def get(self, db: AsyncSession, id: int | str) -> Row | None:
+        results = await db.execute(self._get_statement, {"b_id": id})
+        return results.one_or_none()
+
+    def _build_page_statement(self, *, live: bool, keyset: bool) -> Select:
+        table = self._model.__table__
+        columns = [table.c[name] for name in self.cursor_columns]
+        statement = (
+            select(table).order_by(*columns).limit(bindparam("b_limit"))
+        )
+        if live:
+            # Matches the predicate of the partial index on live rows.
+            statement = statement.where(table.c.deleted.isnot(True))
+        if not keyset:
+            return statement.offset(bindparam("b_offset"))
+        values = [bindparam(f"b_{name}") for name in self.cursor_columns]
+        # The leading column condition lets the planner use its index.
+        return statement.where(
+            and_(columns[0] >= values[0], tuple_(*columns) > tuple_(*values))
+        )
+
+    def _page_statement(self, *, live: bool, keyset: bool) -> Select:
+        key = (live, keyset)
+        if key not in self._page_statements:
+            self._page_statements[key] = self._build_page_statement(
+                live=live, keyset=keyset
+            )
+        return self._page_statements[key]
 
     async def get_multi(
-        self, db: AsyncSession, *, skip=0, limit=100
-    ) -> list[ModelType]:
-        statement = select(self._model).offset(skip).limit(limit)
-        results = await db.execute(statement=statement)
-        return results.scalars().all()
+        self,
+        db: AsyncSession,
+        *,
+        skip=0,
+        limit=100,
+        cursor: str | None = None,
+        live: bool = False,
+    ) -> list[Row]:
+        """Get a page of rows; with ``live`` deleted ones are left out."""
+        params = {"b_limit": limit}
+        if cursor is None:
+            params["b_offset"] = skip
+        else:
+            values = self.parse_cursor(cursor)
+            params.update(
+                (f"b_{name}", value)
+                for name, value in zip(self.cursor_columns, values)
+            )
+        statement = self._page_statement(
+            live=live, keyset=cursor is not None
+        )
+        results = await db.execute(statement, params)
+        return results.all()
+
+    def make_cursor(self, db_obj: ModelType | Row) -> str:
+        return encode_cursor(
+            [getattr(db_obj, name) for name in self.cursor_columns]
+        )
+
+    def parse_cursor(self, cursor: str) -> list[Any]:
+        types = [
+            getattr(self._model, name).type.python_type
+            for name in self.cursor_columns
+        ]
+        return decode_cursor(cursor, types)
 
     async def create(
         self, db: AsyncSession, *, obj_in: CreateSchemaType
@@ -80,11 +181,16 @@ class RepositoryDB(
         self, db: AsyncSession, *, obj_in: list[CreateSchemaType]
     ) -> Any:
         obj_in_data = jsonable_encoder(obj_in)
-        statement = (
-            insert(self._model).values(obj_in_data).returning(self._model.id)
-        )
+        created = []
         try:
-            result = await db.execute(statement)
+            for start in range(0, len(obj_in_data), BULK_CHUNK_SIZE):
+                statement = (
+                    insert(self._model)
+                    .values(obj_in_data[start:start + BULK_CHUNK_SIZE])
+                    .returning(self._model)
+                )
+                results = await db.execute(statement)
+                created.extend(results.scalars().all())
             await db.commit()
         except IntegrityError as e:
             if e.orig.__cause__.__class__ == UniqueViolationError:
@@ -93,42 +199,30 @@ class RepositoryDB(
                     detail="This value is already exist",
                 )
             return None
-        id_list = result.scalars().all()
-        statement = select(self._model).where(self._model.id.in_(id_list))
-        results = await db.execute(statement=statement)
-        return results.scalars().all()
+        return created
 
     async def update(
         self,
         db: AsyncSession,
         *,
-        db_obj: ModelType,
+        db_obj: ModelType | Row,
         obj_in: UpdateSchemaType | dict[str, Any],
-    ) -> ModelType:
+    ) -> Row:
         obj_in_data = jsonable_encoder(obj_in)
-        statement = (
-            update(self._model)
-            .where(self._model.id == db_obj.id)
-            .values(**obj_in_data)
+        results = await db.execute(
+            self._update_statement, {"b_id": db_obj.id, **obj_in_data}
         )
-        await db.execute(statement=statement)
+        row = results.one()
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        return row
 
     async def delete(
         self,
         db: AsyncSession,
         *,
-        db_obj: ModelType,
-    ) -> None:
-        obj_in_data = {"deleted": True}
-        statement = (
-            update(self._model)
-            .where(self._model.id == db_obj.id)
-            .values(**obj_in_data)
-        )
-        await db.execute(statement=statement)
+        db_obj: ModelType | Row,
+    ) -> Row:
+        results = await db.execute(self._delete_statement, {"b_id": db_obj.id})
+        row = results.one()
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        return row
@@ -0,0 +1,438 @@
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable, NamedTuple
+
+import orjson
+
+from core.config import app_settings
+from services.resp import REDIS_ERRORS, RespClient, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-process cache bounded by size (LRU eviction) and entry age (TTL)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        self._data[key] = (monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CacheBackend(ABC):
+    """Key-value store under ``VersionedCache``.
+
+    Values are JSON-compatible; integer counters are kept under separate
+    keys and only changed with ``incr``, which also sets their TTL.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    async def set_many(self, items: list[tuple[str, Any, float]]) -> None:
+        """``set`` every ``(key, value, ttl)``."""
+        for key, value, ttl in items:
+            await self.set(key, value, ttl)
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    async def incr(self, *keys: str, ttl: float) -> list[int]:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process backend on top of ``LRUCache``.
+
+    Counters are kept apart from the LRU, so invalidating many keys does
+    not evict the cached values, and are dropped once expired.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = LRUCache(maxsize, ttl)
+        # Ordered by expiry: every incr uses the same TTL.
+        self._counters: OrderedDict[str, tuple[float, int]] = OrderedDict()
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        return [self._get(key) for key in keys]
+
+    def _get(self, key: str) -> Any | None:
+        item = self._counters.get(key)
+        if item is None:
+            return self._cache.get(key)
+        expires_at, value = item
+        return value if expires_at >= monotonic() else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    async def incr(self, *keys: str, ttl: float) -> list[int]:
+        now = monotonic()
+        while self._counters:
+            key, (expires_at, _) = next(iter(self._counters.items()))
+            if expires_at >= now:
+                break
+            del self._counters[key]
+        values = []
+        for key in keys:
+            value = (self._get(key) or 0) + 1
+            self._counters[key] = (now + ttl, value)
+            self._counters.move_to_end(key)
+            values.append(value)
+        return values
+
+    async def clear(self) -> None:
+        self._cache.clear()
+        self._counters.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.name,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "counters": len(self._counters),
+        }
+
+
+class FakeBackend(CacheBackend):
+    """Stand-in for a shared backend in tests.
+
+    Instances created over the same ``store`` see each other's writes like
+    workers sharing one Redis, and values are round-tripped through JSON
+    the same way ``RedisBackend`` does.
+    """
+
+    name = "fake"
+
+    def __init__(self, store: dict[str, tuple[float, bytes]] | None = None):
+        self.store = {} if store is None else store
+        self.calls = 0
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        self.calls += 1
+        values = []
+        for key in keys:
+            expires_at, data = self.store.get(key, (0.0, None))
+            if data is not None and expires_at < monotonic():
+                del self.store[key]
+                data = None
+            values.append(None if data is None else orjson.loads(data))
+        return values
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self.calls += 1
+        self.store[key] = (monotonic() + ttl, orjson.dumps(value))
+
+    async def set_many(self, items: list[tuple[str, Any, float]]) -> None:
+        self.calls += 1
+        for key, value, ttl in items:
+            self.store[key] = (monotonic() + ttl, orjson.dumps(value))
+
+    async def delete(self, *keys: str) -> None:
+        self.calls += 1
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def incr(self, *keys: str, ttl: float) -> list[int]:
+        self.calls += 1
+        values = []
+        for key in keys:
+            expires_at, data = self.store.get(key, (0.0, b"0"))
+            value = (int(data) if expires_at >= monotonic() else 0) + 1
+            self.store[key] = (monotonic() + ttl, orjson.dumps(value))
+            values.append(value)
+        return values
+
+    async def clear(self) -> None:
+        self.store.clear()
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend speaking the Redis protocol.
+
+    Keys are namespaced with ``prefix``; every method is one round trip.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: RespClient, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        values = await self.client.execute(
+            "MGET", *(self.prefix + key for key in keys)
+        )
+        return [
+            None if data is None else orjson.loads(data) for data in values
+        ]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.set_many([(key, value, ttl)])
+
+    async def set_many(self, items: list[tuple[str, Any, float]]) -> None:
+        await self.client.pipeline(
+            *(
+                (
+                    "SET",
+                    self.prefix + key,
+                    orjson.dumps(value),
+                    "PX",
+                    max(int(ttl * 1000), 1),
+                )
+                for key, value, ttl in items
+            )
+        )
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.execute(
+                "DEL", *(self.prefix + key for key in keys)
+            )
+
+    async def incr(self, *keys: str, ttl: float) -> list[int]:
+        # Every INCR is followed by its PEXPIRE, so counters do not pile up.
+        ttl_ms = max(int(ttl * 1000), 1)
+        replies = await self.client.pipeline(
+            *(
+                command
+                for key in keys
+                for command in (
+                    ("INCR", self.prefix + key),
+                    ("PEXPIRE", self.prefix + key, ttl_ms),
+                )
+            )
+        )
+        return replies[::2]
+
+    async def clear(self) -> None:
+        cursor = b"0"
+        while True:
+            cursor, keys = await self.client.execute(
+                "SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000
+            )
+            if keys:
+                await self.client.execute("DEL", *keys)
+            if cursor == b"0":
+                return
+
+
+class CacheResult(NamedTuple):
+    hit: bool
+    # ``None`` on a hit is a cached "not found".
+    value: Any
+    # Version seen before the lookup, to be passed back to ``set``;
+    # ``None`` when the backend failed and nothing should be stored.
+    version: int | None
+
+
+class VersionedCache:
+    """Read-through cache with negative entries and versioned invalidation.
+
+    Every key has a version counter next to its entry. Entries are stored
+    tagged with the version read before the DB lookup, and ``invalidate``
+    bumps the version, so a value read from the DB before an update can
+    never be served after it. A counter expires twice the longest entry
+    TTL after its last bump, when no entry tagged with an older version
+    can be left. ``None`` values are cached for the shorter
+    ``negative_ttl``. Backend failures are logged and treated as misses.
+    """
+
+    def __init__(
+        self, backend: CacheBackend, *, ttl: float, negative_ttl: float
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.version_ttl = 2 * max(ttl, negative_ttl)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> CacheResult:
+        [result] = await self.get_many([key])
+        return result
+
+    async def get_many(self, keys: list[str]) -> list[CacheResult]:
+        """``get`` of every key with a single backend call."""
+        if not keys:
+            return []
+        try:
+            values = await self.backend.get_many(
+                [name for key in keys for name in (f"v:{key}", f"n:{key}")]
+            )
+        except REDIS_ERRORS:
+            self._failed("read", keys[0])
+            return [CacheResult(False, None, None)] * len(keys)
+        return [
+            self._result(entry, version or 0)
+            for entry, version in zip(values[::2], values[1::2])
+        ]
+
+    async def set(self, key: str, value: Any, version: int | None) -> None:
+        await self.set_many([(key, value, version)])
+
+    async def set_many(self, items: list[tuple[str, Any, int | None]]) -> None:
+        """``set`` every ``(key, value, version)`` with one backend call."""
+        entries = []
+        for key, value, version in items:
+            ttl = self.ttl if value is not None else self.negative_ttl
+            if version is not None and ttl > 0:
+                entries.append((f"v:{key}", [version, value], ttl))
+        if not entries:
+            return
+        try:
+            await self.backend.set_many(entries)
+        except REDIS_ERRORS:
+            self._failed("write", items[0][0])
+
+    async def invalidate(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            await self.backend.incr(
+                *(f"n:{key}" for key in keys), ttl=self.version_ttl
+            )
+            await self.backend.delete(*(f"v:{key}" for key in keys))
+        except REDIS_ERRORS:
+            self._failed("invalidate", keys[0])
+
+    async def discard(self, *keys: str) -> None:
+        """Drop the entries of new keys, leaving their versions alone.
+
+        Only a cached "not found" can be there, and a new key needs no
+        counter. A miss read just before the create may still be cached,
+        for at most ``negative_ttl``.
+        """
+        if not keys:
+            return
+        try:
+            await self.backend.delete(*(f"v:{key}" for key in keys))
+        except REDIS_ERRORS:
+            self._failed("invalidate", keys[0])
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.backend.stats(),
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+    def _result(self, entry: list | None, version: int) -> CacheResult:
+        if entry is not None and entry[0] == version:
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return CacheResult(True, entry[1], version)
+        self.misses += 1
+        return CacheResult(False, None, version)
+
+    def _failed(self, action: str, key: str) -> None:
+        self.errors += 1
+        logger.warning(
+            "Link cache %s failed for %s", action, key, exc_info=True
+        )
+
+
+def get_cache_backend(name: str) -> CacheBackend:
+    if name == "memory":
+        return MemoryBackend(
+            app_settings.link_cache_size, app_settings.link_cache_ttl
+        )
+    if name == "redis":
+        return RedisBackend(
+            get_redis_client(),
+            # The number is the entry format, bumped when it changes.
+            prefix="shorten:link:3:",
+        )
+    raise ValueError(f"Unknown link cache backend: {name}")
+
+
+link_cache = VersionedCache(
+    get_cache_backend(app_settings.link_cache_backend),
+    ttl=app_settings.link_cache_ttl,
+    negative_ttl=app_settings.link_cache_negative_ttl,
+)
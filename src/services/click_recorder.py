@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from time import monotonic
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from core.config import app_settings
+from db.database import async_session
+from models.short_link_model import Link as LinkModel
+from models.short_link_model import Transfer as TransferModel
+from models.short_link_model import TransferRollup as TransferRollupModel
+from schemas.short_link_schema import Granularity, TransferCreate
+
+logger = logging.getLogger(__name__)
+
+Click = tuple[TransferCreate, int, datetime]
+
+link_table = LinkModel.__table__
+rollup_table = TransferRollupModel.__table__
+
+# Built once and executed with a list of parameters, like the hot
+# statements of RepositoryDB. asyncpg runs such an executemany as one
+# prepared statement without a round trip per row, which is cheaper than
+# a multi-row VALUES compiled for every batch size (see
+# benchmarks/bench_statements.py).
+TRANSFER_INSERT = insert(TransferModel.__table__)
+COUNT_UPDATE = (
+    update(link_table)
+    .where(link_table.c.id == bindparam("b_link_id"))
+    .values(
+        transfer_count=link_table.c.transfer_count + bindparam("b_increment"),
+        last_transfer_at=bindparam("b_recorded_at"),
+        # Clicks change the status, not the link: no onupdate.
+        updated_at=link_table.c.updated_at,
+    )
+)
+_rollup_insert = pg_insert(rollup_table)
+ROLLUP_UPSERT = _rollup_insert.on_conflict_do_update(
+    index_elements=["link_id", "granularity", "bucket"],
+    set_={"count": rollup_table.c.count + _rollup_insert.excluded.count},
+)
+
+
+class ClickRecorder:
+    """Buffers redirect clicks and writes them to the DB in batches.
+
+    ``record`` never waits: a click is put into a bounded queue or counted
+    as dropped when the queue is full. A writer task collects clicks until
+    ``batch_size`` is reached or ``flush_interval`` seconds have passed and
+    stores them with one executemany of a prepared INSERT, bumping the
+    denormalized ``Link.transfer_count`` and ``Link.last_transfer_at`` and
+    the per-bucket ``TransferRollup`` counters of the affected links in
+    the same transaction.
+    """
+
+    def __init__(
+        self, *, maxsize: int, batch_size: int, flush_interval: float
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: asyncio.Queue[Click] = asyncio.Queue(maxsize)
+        self._pending: list[Click] = []
+        self._task: asyncio.Task | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, transfer_in: TransferCreate, link_key: int) -> bool:
+        """Queue a click on the link ``transfer_in.link_id``.
+
+        ``link_key`` is the integer key of that link the transfer rows
+        refer to.
+        """
+        try:
+            self._queue.put_nowait((transfer_in, link_key, datetime.utcnow()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def start(self) -> None:
+        if not self.running:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # ``wait_for`` may swallow the cancellation (before Python
+            # 3.12), the flag makes the writer exit after its batch anyway.
+            self._stopping = True
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.drain()
+
+    async def drain(self) -> None:
+        """Write everything that is queued at the moment of the call."""
+        while self._pending or not self._queue.empty():
+            while (
+                len(self._pending) < self.batch_size
+                and not self._queue.empty()
+            ):
+                self._pending.append(self._queue.get_nowait())
+            batch, self._pending = self._pending, []
+            await self._flush(batch)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "queue_depth": self._queue.qsize() + len(self._pending),
+            "queue_maxsize": self._queue.maxsize,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            # The write is shielded so that stopping the writer never
+            # interrupts a statement in flight; ``stop`` awaits it instead.
+            self._flush_task = asyncio.create_task(self._flush(batch))
+            await asyncio.shield(self._flush_task)
+            self._flush_task = None
+
+    async def _collect(self) -> None:
+        self._pending.append(await self._queue.get())
+        deadline = monotonic() + self.flush_interval
+        # The flag also ends a wait whose cancellation was swallowed.
+        while len(self._pending) < self.batch_size and not self._stopping:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                return
+            try:
+                click = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return
+            self._pending.append(click)
+
+    async def _flush(self, batch: list[Click]) -> None:
+        if not batch:
+            return
+        values = [
+            {
+                "client_host": transfer_in.client_host,
+                "link_key": link_key,
+                "date": date,
+            }
+            for transfer_in, link_key, date in batch
+        ]
+        link_ids = [transfer_in.link_id for transfer_in, _, _ in batch]
+        counts = Counter(link_ids)
+        # The write time rather than the click time: clicks wait in the
+        # queue, and this is the Last-Modified of the link status.
+        recorded_at = datetime.utcnow()
+        # Sorted to take row locks in the same order in every worker.
+        count_values = [
+            {
+                "b_link_id": link_id,
+                "b_increment": count,
+                "b_recorded_at": recorded_at,
+            }
+            for link_id, count in sorted(counts.items())
+        ]
+        try:
+            async with async_session() as db:
+                await db.execute(TRANSFER_INSERT, values)
+                await db.execute(COUNT_UPDATE, count_values)
+                await db.execute(
+                    ROLLUP_UPSERT, self._rollup_values(link_ids, values)
+                )
+                await db.commit()
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to record %d clicks", len(batch))
+            return
+        self.recorded += len(batch)
+
+    @staticmethod
+    def _rollup_values(link_ids: list[str], values: list[dict]) -> list[dict]:
+        buckets = Counter()
+        for link_id, value in zip(link_ids, values):
+            for granularity in Granularity:
+                bucket = granularity.truncate(value["date"])
+                buckets[link_id, granularity.value, bucket] += 1
+        return [
+            {
+                "link_id": link_id,
+                "granularity": granularity,
+                "bucket": bucket,
+                "count": count,
+            }
+            for (link_id, granularity, bucket), count in sorted(
+                buckets.items()
+            )
+        ]
+
+
+click_recorder = ClickRecorder(
+    maxsize=app_settings.click_queue_size,
+    batch_size=app_settings.click_batch_size,
+    flush_interval=app_settings.click_flush_interval,
+)
@@ -0,0 +1,266 @@
+"""Compaction of long-deleted links.
+
+Usage: python -m services.compaction [--dry-run] [--older-than DAYS]
+
+A deleted link is only marked ``deleted``, so it stays in the link table,
+its indexes and every scan. Links deleted (or last changed) more than
+LINK_COMPACTION_AFTER_DAYS days ago are moved to ``archived_link`` and
+their transfers to ``archived_transfer``, oldest first. A link is moved
+with all its transfers and rollups in one transaction that holds its row
+lock, so an update or a restore of the link either waits or keeps it out
+of the batch. Every transaction moves at most LINK_COMPACTION_BATCH_SIZE
+links and about LINK_COMPACTION_TRANSFER_BATCH_SIZE transfers (more only if
+a single link has more), so the locks and the WAL of a step stay small.
+The app runs the same compaction every LINK_COMPACTION_INTERVAL
+seconds if LINK_COMPACTION_AFTER_DAYS is set.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from functools import cached_property
+
+from sqlalchemy import (Delete, Insert, Select, bindparam, delete, func,
+                        insert, select, text)
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import app_settings
+from db.database import engine
+from models.short_link_model import ArchivedLink as ArchivedLinkModel
+from models.short_link_model import ArchivedTransfer as ArchivedTransferModel
+from models.short_link_model import Link as LinkModel
+from models.short_link_model import Transfer as TransferModel
+from models.short_link_model import TransferRollup as TransferRollupModel
+from services.base_services import any_of
+
+logger = logging.getLogger(__name__)
+
+# Key of the advisory lock that keeps workers from compacting at once.
+COMPACTION_LOCK_KEY = 7_406_514
+
+ARCHIVED_LINK_COLUMNS = (
+    "id",
+    "key",
+    "original_url",
+    "created_at",
+    "updated_at",
+    "transfer_count",
+    "last_transfer_at",
+)
+ARCHIVED_TRANSFER_COLUMNS = ("id", "date", "client_host", "link_key")
+
+
+class LinkCompactor:
+    """Moves links deleted before a cutoff to the archive tables."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        after_days: int,
+        batch_size: int,
+        transfer_batch_size: int,
+        interval: float,
+    ):
+        self.engine = engine
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.transfer_batch_size = transfer_batch_size
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    @cached_property
+    def _tombstones_statement(self) -> Select:
+        # Served by the partial index ix_link_deleted_updated_at. Links
+        # locked by a request right now are left for a later batch.
+        return (
+            select(LinkModel.key, LinkModel.transfer_count)
+            .where(
+                LinkModel.deleted.is_(True),
+                LinkModel.updated_at < bindparam("b_cutoff"),
+            )
+            .order_by(LinkModel.updated_at)
+            .limit(bindparam("b_limit"))
+            .with_for_update(skip_locked=True)
+        )
+
+    @cached_property
+    def _count_statement(self) -> Select:
+        return select(
+            func.count(), func.coalesce(func.sum(LinkModel.transfer_count), 0)
+        ).where(
+            LinkModel.deleted.is_(True),
+            LinkModel.updated_at < bindparam("b_cutoff"),
+        )
+
+    @cached_property
+    def _move_transfers_statement(self) -> Insert:
+        # Core tables: an ORM DML statement cannot be used inside a CTE.
+        table = TransferModel.__table__
+        moved = (
+            delete(table)
+            .where(any_of(table.c.link_key, "b_keys"))
+            .returning(*(table.c[name] for name in ARCHIVED_TRANSFER_COLUMNS))
+            .cte("moved")
+        )
+        return insert(ArchivedTransferModel.__table__).from_select(
+            ARCHIVED_TRANSFER_COLUMNS, select(moved)
+        )
+
+    @cached_property
+    def _delete_rollups_statement(self) -> Delete:
+        return delete(TransferRollupModel).where(
+            TransferRollupModel.link_id.in_(
+                select(LinkModel.id).where(any_of(LinkModel.key, "b_keys"))
+            )
+        )
+
+    @cached_property
+    def _move_links_statement(self) -> Insert:
+        table = LinkModel.__table__
+        moved = (
+            delete(table)
+            .where(any_of(table.c.key, "b_keys"))
+            .returning(*(table.c[name] for name in ARCHIVED_LINK_COLUMNS))
+            .cte("moved")
+        )
+        return insert(ArchivedLinkModel.__table__).from_select(
+            ARCHIVED_LINK_COLUMNS, select(moved)
+        )
+
+    async def compact_batch(self, cutoff: datetime) -> tuple[int, int]:
+        """Archive the next batch of links in one transaction.
+
+        Returns the number of links and transfers moved.
+        """
+        async with self.engine.begin() as connection:
+            rows = await connection.execute(
+                self._tombstones_statement,
+                {"b_cutoff": cutoff, "b_limit": self.batch_size},
+            )
+            keys, transfers = [], 0
+            for key, count in rows:
+                if keys and transfers + count > self.transfer_batch_size:
+                    break
+                keys.append(key)
+                transfers += count
+            if not keys:
+                return 0, 0
+            transfers = await connection.execute(
+                self._move_transfers_statement, {"b_keys": keys}
+            )
+            await connection.execute(
+                self._delete_rollups_statement, {"b_keys": keys}
+            )
+            links = await connection.execute(
+                self._move_links_statement, {"b_keys": keys}
+            )
+        return links.rowcount, transfers.rowcount
+
+    async def run_once(
+        self, *, after_days: int | None = None, dry_run: bool = False
+    ) -> dict[str, int] | None:
+        """Compact everything past the cutoff.
+
+        Returns the number of links and transfers archived (or that would
+        be with ``dry_run``), or ``None`` if another process is compacting
+        right now.
+        """
+        if after_days is None:
+            after_days = self.after_days
+        cutoff = datetime.utcnow() - timedelta(days=after_days)
+        if dry_run:
+            async with self.engine.connect() as connection:
+                links, transfers = (
+                    await connection.execute(
+                        self._count_statement, {"b_cutoff": cutoff}
+                    )
+                ).one()
+            return {"links": links, "transfers": transfers}
+        async with self.engine.connect() as lock:
+            locked = await lock.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"),
+                {"key": COMPACTION_LOCK_KEY},
+            )
+            if not locked:
+                return None
+            try:
+                totals = {"links": 0, "transfers": 0}
+                while True:
+                    links, transfers = await self.compact_batch(cutoff)
+                    if not links:
+                        break
+                    totals["links"] += links
+                    totals["transfers"] += transfers
+            finally:
+                await lock.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": COMPACTION_LOCK_KEY},
+                )
+        return totals
+
+    async def start(self) -> None:
+        if self.after_days > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                totals = await self.run_once()
+            except Exception:
+                logger.exception("Link compaction failed")
+            else:
+                if totals and totals["links"]:
+                    logger.info("Archived deleted links: %s", totals)
+            await asyncio.sleep(self.interval)
+
+
+link_compactor = LinkCompactor(
+    engine,
+    after_days=app_settings.link_compaction_after_days,
+    batch_size=app_settings.link_compaction_batch_size,
+    transfer_batch_size=app_settings.link_compaction_transfer_batch_size,
+    interval=app_settings.link_compaction_interval,
+)
+
+
+async def main(after_days: int, dry_run: bool) -> None:
+    try:
+        totals = await link_compactor.run_once(
+            after_days=after_days, dry_run=dry_run
+        )
+    finally:
+        await engine.dispose()
+    if totals is None:
+        print("Compaction is running in another process")
+        return
+    for key, count in totals.items():
+        print(f"{key}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--older-than",
+        type=int,
+        default=app_settings.link_compaction_after_days,
+        help="Archive links deleted more than this many days ago.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print how many links and transfers would be archived.",
+    )
+    args = parser.parse_args()
+    if args.older_than <= 0:
+        parser.error("--older-than must be positive")
+    asyncio.run(main(args.older_than, args.dry_run))
@@ -0,0 +1,54 @@
+from hashlib import blake2b, sha256
+from math import log
+from urllib.parse import urlsplit, urlunsplit
+
+from core.config import app_settings
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host and drop the default port."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.username or parts.password:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    return urlunsplit(
+        (scheme, netloc, parts.path or "/", parts.query, parts.fragment)
+    )
+
+
+def url_hash(url: str) -> str:
+    return sha256(normalize_url(url).encode()).hexdigest()
+
+
+class BloomFilter:
+    """Set membership with false positives but without false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = max(8, int(-capacity * log(error_rate) / log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        for number in range(self.hash_count):
+            yield (first + number * step) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+url_filter = BloomFilter(app_settings.link_dedup_filter_capacity)
@@ -0,0 +1,297 @@
+"""Export of closed days of transfers to columnar files.
+
+Usage: python -m services.export [--until YYYY-MM-DD]
+
+Every day between the high-water mark kept in
+``TRANSFER_EXPORT_DIR/state.json`` and the last closed day is written to
+``transfer-YYYY-MM-DD.parquet`` (or ``.arrow`` for Arrow IPC) and the mark is
+moved past it. A day is closed once TRANSFER_EXPORT_DELAY seconds have passed
+since its end, so that buffered clicks have been written; on a replica the time
+of its last replayed commit counts instead of now, so a lagging replica never
+exports a day it has not fully received. Transfers already moved to
+``archived_transfer`` by compaction are exported too. The app runs the same
+export every TRANSFER_EXPORT_INTERVAL seconds if it is set.
+
+Requires pyarrow.
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import CompoundSelect, func, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from db.database import async_session, engine, replica_router
+from models.short_link_model import ArchivedLink as ArchivedLinkModel
+from models.short_link_model import ArchivedTransfer as ArchivedTransferModel
+from models.short_link_model import Link as LinkModel
+from models.short_link_model import Transfer as TransferModel
+from schemas.short_link_schema import Granularity
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("parquet", "arrow")
+EXPORT_BATCH_SIZE = 50_000
+COMPRESSION = "zstd"
+STATE_FILE = "state.json"
+# Migration 08 dated the transfers recorded without a date like this.
+UNKNOWN_DATE = datetime(1970, 1, 1)
+
+
+def transfers_statement() -> CompoundSelect:
+    """Live and archived transfers with the id of their link."""
+    return union_all(
+        *(
+            select(
+                transfer.id,
+                transfer.date,
+                func.host(transfer.client_host).label("client_host"),
+                link.id.label("link_id"),
+            ).join(link, link.key == transfer.link_key)
+            for transfer, link in (
+                (TransferModel, LinkModel),
+                (ArchivedTransferModel, ArchivedLinkModel),
+            )
+        )
+    )
+
+
+def export_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("date", pa.timestamp("us")),
+            ("client_host", pa.string()),
+            ("link_id", pa.string()),
+        ]
+    )
+
+
+class FileWriter:
+    """Writes record batches to a Parquet or Arrow IPC file.
+
+    The file gets its final name only on ``close``, so a crashed export
+    never leaves a truncated file behind under the final name.
+    """
+
+    def __init__(self, path: Path, export_format: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.temp_path = path.with_name(path.name + ".tmp")
+        self.schema = export_schema()
+        if export_format == "parquet":
+            self._writer = pq.ParquetWriter(
+                self.temp_path, self.schema, compression=COMPRESSION
+            )
+        else:
+            self._writer = pa.ipc.new_file(
+                str(self.temp_path),
+                self.schema,
+                options=pa.ipc.IpcWriteOptions(compression=COMPRESSION),
+            )
+
+    def write(self, rows: list[tuple]) -> None:
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        self._writer.write_batch(
+            pa.RecordBatch.from_arrays(
+                [
+                    pa.array(column, type=field.type)
+                    for column, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        )
+
+    def close(self) -> None:
+        self._writer.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self) -> None:
+        self._writer.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+class TransferExporter:
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        export_format: str,
+        delay: float,
+        interval: float,
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        self.directory = directory
+        self.export_format = export_format
+        self.delay = delay
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / STATE_FILE
+
+    def read_high_water_mark(self) -> datetime | None:
+        try:
+            state = json.loads(self.state_path.read_text())
+        except FileNotFoundError:
+            return None
+        return datetime.fromisoformat(state["high_water_mark"])
+
+    def write_high_water_mark(self, mark: datetime) -> None:
+        temp_path = self.state_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"high_water_mark": mark.isoformat()}))
+        os.replace(temp_path, self.state_path)
+
+    def closed_until(self, now: datetime) -> datetime:
+        return Granularity.day.truncate(now - timedelta(seconds=self.delay))
+
+    async def export(self, until: datetime | None = None) -> list[Path]:
+        """Export the closed days after the high-water mark.
+
+        Returns the written files; nothing is done if another process is
+        exporting into the same directory.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return []
+            return await self._export(until or datetime.utcnow())
+
+    async def _export(self, until: datetime) -> list[Path]:
+        # Reading from a replica keeps the export off the primary.
+        replica = replica_router.choose()
+        session_factory = replica.session if replica else async_session
+        written = []
+        async with session_factory() as db:
+            if replica:
+                replayed = await db.scalar(
+                    text(
+                        "SELECT timezone('utc', "
+                        "pg_last_xact_replay_timestamp())"
+                    )
+                )
+                if replayed is None:
+                    return written
+                until = min(until, replayed)
+            closed_until = self.closed_until(until)
+            day = self.read_high_water_mark()
+            if day is None:
+                day = await self._first_day(db)
+                if day is None:
+                    return written
+            while day < closed_until:
+                next_day = day + timedelta(days=1)
+                path = await self._export_range(db, day, next_day)
+                if path is not None:
+                    written.append(path)
+                self.write_high_water_mark(next_day)
+                day = next_day
+        return written
+
+    async def _first_day(self, db: AsyncSession) -> datetime | None:
+        transfers = transfers_statement().subquery()
+        first = await db.scalar(
+            select(func.min(transfers.c.date)).where(
+                transfers.c.date > UNKNOWN_DATE
+            )
+        )
+        return Granularity.day.truncate(first) if first else None
+
+    async def _export_range(
+        self, db: AsyncSession, start: datetime, end: datetime
+    ) -> Path | None:
+        transfers = transfers_statement().subquery()
+        statement = (
+            select(transfers)
+            .where(transfers.c.date >= start, transfers.c.date < end)
+            .order_by(transfers.c.date, transfers.c.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        path = (
+            self.directory / f"transfer-{start:%Y-%m-%d}.{self.export_format}"
+        )
+        writer = None
+        try:
+            results = await db.stream(statement)
+            async for rows in results.partitions():
+                if writer is None:
+                    writer = FileWriter(path, self.export_format)
+                # Encoding and compression run off the event loop.
+                await asyncio.to_thread(writer.write, rows)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is None:
+            return None
+        await asyncio.to_thread(writer.close)
+        return path
+
+    async def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                written = await self.export()
+            except Exception:
+                logger.exception("Transfer export failed")
+            else:
+                if written:
+                    logger.info("Exported transfers to %s", written)
+            await asyncio.sleep(self.interval)
+
+
+transfer_exporter = TransferExporter(
+    Path(app_settings.transfer_export_dir),
+    export_format=app_settings.transfer_export_format,
+    delay=app_settings.transfer_export_delay,
+    interval=app_settings.transfer_export_interval,
+)
+
+
+async def main(until: datetime | None) -> None:
+    try:
+        written = await transfer_exporter.export(until)
+    finally:
+        await engine.dispose()
+    for path in written:
+        print(path)
+    print(f"High-water mark: {transfer_exporter.read_high_water_mark()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="Export as if it were this UTC time instead of now.",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.until))
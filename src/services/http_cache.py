@@ -0,0 +1,66 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag of the state a representation is built from.
+
+    Weak, since the same state may be sent with another content encoding.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def http_date(date: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(date.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def cache_headers(
+    etag: str, last_modified: datetime | None, cache_control: str
+) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of ``etag`` with an If-None-Match value."""
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None
+) -> bool:
+    """Whether a GET may be answered 304 (RFC 9110, 13.2.2).
+
+    If-Modified-Since is only looked at without If-None-Match.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # HTTP dates have a one second resolution.
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,82 @@
+import asyncio
+from abc import ABC, abstractmethod
+from math import gcd
+from random import choices
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from models.short_link_model import SHORT_LINK_ALPHABET, link_id_block_seq
+
+
+class IdGenerator(ABC):
+    def __init__(self, length: int):
+        self.length = length
+
+    @abstractmethod
+    async def next_id(self, db: AsyncSession) -> str:
+        raise NotImplementedError
+
+
+class RandomIdGenerator(IdGenerator):
+    """Uniformly random ids; the collision rate equals the table fill."""
+
+    async def next_id(self, db: AsyncSession) -> str:
+        return "".join(choices(SHORT_LINK_ALPHABET, k=self.length))
+
+
+class SequenceIdGenerator(IdGenerator):
+    """Ids derived from a DB sequence, never colliding with each other.
+
+    Every worker reserves ``block_size`` numbers with one ``nextval`` call
+    and hands them out locally. Numbers are mapped onto the whole keyspace
+    by a multiplicative bijection, so consecutive ids do not look alike.
+    """
+
+    def __init__(self, length: int, block_size: int):
+        super().__init__(length)
+        self.block_size = block_size
+        self.keyspace = len(SHORT_LINK_ALPHABET) ** length
+        multiplier = int(self.keyspace * 0.6180339887)
+        while gcd(multiplier, self.keyspace) != 1:
+            multiplier += 1
+        self._multiplier = multiplier
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    def id_for(self, number: int) -> str:
+        if not 0 <= number < self.keyspace:
+            raise ValueError("Short link keyspace is exhausted")
+        value = number * self._multiplier % self.keyspace
+        base = len(SHORT_LINK_ALPHABET)
+        chars = []
+        for _ in range(self.length):
+            value, index = divmod(value, base)
+            chars.append(SHORT_LINK_ALPHABET[index])
+        return "".join(chars)
+
+    async def next_id(self, db: AsyncSession) -> str:
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    block = await db.scalar(link_id_block_seq.next_value())
+                    # Sequences start at 1.
+                    self._next = (block - 1) * self.block_size
+                    self._end = self._next + self.block_size
+        number = self._next
+        self._next += 1
+        return self.id_for(number)
+
+
+def get_id_generator(name: str) -> IdGenerator:
+    if name == "random":
+        return RandomIdGenerator(app_settings.short_link_length)
+    if name == "sequence":
+        return SequenceIdGenerator(
+            app_settings.short_link_length, app_settings.short_link_block_size
+        )
+    raise ValueError(f"Unknown short link generator: {name}")
+
+
+id_generator = get_id_generator(app_settings.short_link_generator)
@@ -0,0 +1,125 @@
+"""Readiness and warm-up of a worker process.
+
+A worker reports ready (``GET /api/v1/service/ready``) only after the
+warm-up at startup, and stops reporting it as soon as it is asked to
+shut down, so that a load balancer sends requests to warm workers only.
+"""
+import asyncio
+import logging
+from time import perf_counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from core.config import app_settings
+from db.database import async_session, engine, replica_router
+from models.short_link_model import Link as LinkModel
+from services.dedup import url_filter
+from services.resp import get_redis_client
+from services.short_link_crud import link_crud
+
+logger = logging.getLogger(__name__)
+
+URL_FILTER_BATCH_SIZE = 10_000
+
+
+class WorkerState:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+
+
+worker_state = WorkerState()
+
+
+async def warm_pool(pool_engine: AsyncEngine, size: int) -> None:
+    """Open ``size`` connections and prepare the hot statements on each."""
+
+    async def prepare() -> None:
+        async with pool_engine.connect() as connection:
+            db = AsyncSession(bind=connection)
+            await link_crud.lookup(db, "")
+            await link_crud.get(db, "")
+            await db.close()
+
+    await asyncio.gather(*(prepare() for _ in range(size)))
+
+
+async def warm_pools() -> int:
+    """``warm_pool`` of the primary and every healthy replica."""
+    size = app_settings.db_pool_size
+    await warm_pool(engine, size)
+    connections = size
+    for replica in replica_router.replicas:
+        if not replica.healthy:
+            continue
+        try:
+            await warm_pool(replica.engine, size)
+        except Exception as error:
+            # A replica is optional, the router handles it going down.
+            logger.warning("Replica warm-up failed: %s", error)
+        else:
+            connections += size
+    return connections
+
+
+async def warm_link_cache(size: int) -> int:
+    """Put the links with most transfers into the link cache."""
+    async with async_session() as db:
+        ids = await db.scalars(
+            select(LinkModel.id)
+            .where(LinkModel.deleted.isnot(True))
+            .order_by(LinkModel.transfer_count.desc())
+            .limit(size)
+        )
+        resolved = await link_crud.resolve_many(db, ids.all())
+    return len(resolved)
+
+
+async def warm_url_filter() -> int:
+    """Add the URL hashes of live links to the dedup filter."""
+    count = 0
+    async with async_session() as db:
+        results = await db.stream_scalars(
+            select(LinkModel.url_hash)
+            .where(
+                LinkModel.url_hash.isnot(None), LinkModel.deleted.isnot(True)
+            )
+            .execution_options(yield_per=URL_FILTER_BATCH_SIZE)
+        )
+        async for url_hash in results:
+            url_filter.add(url_hash)
+            count += 1
+    return count
+
+
+async def warm_up() -> None:
+    """Warm the pools and caches; failures are logged, not raised."""
+    started = perf_counter()
+    try:
+        connections = await warm_pools()
+        cached = 0
+        if app_settings.link_cache_warm_size > 0:
+            cached = await warm_link_cache(app_settings.link_cache_warm_size)
+        hashes = 0
+        if app_settings.link_dedup:
+            hashes = await warm_url_filter()
+    except Exception:
+        logger.exception("Warm-up failed")
+        return
+    logger.info(
+        "Warmed up in %.2f s: %d connections, %d cached links, "
+        "%d URL hashes",
+        perf_counter() - started,
+        connections,
+        cached,
+        hashes,
+    )
+
+
+async def dispose() -> None:
+    """Close the connections of the engines and the Redis client."""
+    await engine.dispose()
+    for replica in replica_router.replicas:
+        await replica.engine.dispose()
+    await get_redis_client().close()
@@ -0,0 +1,34 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Pack keyset values into an opaque url-safe string."""
+    raw = json.dumps(jsonable_encoder(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: list[type]) -> list[Any]:
+    """Unpack a cursor made by ``encode_cursor``.
+
+    Raises ``ValueError`` if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    result = []
+    for value, type_ in zip(values, types):
+        if type_ is datetime and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, type_):
+            raise ValueError("Invalid cursor")
+        result.append(value)
+    return result
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from math import ceil
+from time import monotonic
+
+from fastapi import HTTPException, Request, status
+
+from core.config import app_settings
+from core.metrics import Counter, registry
+from services.resp import (REDIS_ERRORS, RespClient, RespError,
+                           get_redis_client)
+
+logger = logging.getLogger(__name__)
+
+rate_limited_requests = registry.register(
+    Counter(
+        "rate_limited_requests_total",
+        "Requests rejected by the rate limiter.",
+        ("limit",),
+    )
+)
+
+
+class RateLimitBackend(ABC):
+    """Token buckets: ``burst`` tokens, refilled at ``rate`` per second."""
+
+    name: str
+
+    @abstractmethod
+    async def acquire(self, key: str, *, rate: float, burst: int) -> float:
+        """Take a token; return 0 or the seconds until one is available."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets of at most ``maxsize`` clients.
+
+    Buckets are kept in LRU order, so every request is O(1) and the least
+    recently seen client is forgotten (gets a full bucket) on overflow.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def acquire(self, key: str, *, rate: float, burst: int) -> float:
+        now = monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Refill and take a token atomically, on the Redis clock so that workers
+# with skewed clocks share one bucket. Returns the wait as a string since
+# Lua numbers are truncated to integers in replies.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET_SCRIPT.encode()).hexdigest()
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets shared by all workers, one round trip per request.
+
+    Requests are let through when Redis is unavailable.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: RespClient, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    async def acquire(self, key: str, *, rate: float, burst: int) -> float:
+        args = (1, self.prefix + key, rate, burst)
+        try:
+            try:
+                wait = await self.client.execute(
+                    "EVALSHA", TOKEN_BUCKET_SHA, *args
+                )
+            except RespError as error:
+                if not str(error).startswith("NOSCRIPT"):
+                    raise
+                wait = await self.client.execute(
+                    "EVAL", TOKEN_BUCKET_SCRIPT, *args
+                )
+        except REDIS_ERRORS:
+            logger.warning(
+                "Rate limit check failed for %s", key, exc_info=True
+            )
+            return 0.0
+        return float(wait)
+
+
+class RateLimit:
+    """Dependency limiting the requests of every client host."""
+
+    def __init__(
+        self,
+        name: str,
+        backend: RateLimitBackend,
+        *,
+        rate: float,
+        burst: int,
+        enabled: bool = True,
+    ):
+        self.name = name
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.enabled = enabled
+
+    async def __call__(self, request: Request) -> None:
+        if not self.enabled or self.rate <= 0:
+            return
+        wait = await self.backend.acquire(
+            f"{self.name}:{request.client.host}",
+            rate=self.rate,
+            burst=self.burst,
+        )
+        if wait > 0:
+            rate_limited_requests.inc((self.name,))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(ceil(wait))},
+            )
+
+
+def get_rate_limit_backend(name: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryRateLimitBackend(app_settings.rate_limit_max_clients)
+    if name == "redis":
+        return RedisRateLimitBackend(
+            get_redis_client(), prefix="shorten:rate:"
+        )
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+rate_limit_backend = get_rate_limit_backend(app_settings.rate_limit_backend)
+rate_limit_create = RateLimit(
+    "create",
+    rate_limit_backend,
+    rate=app_settings.rate_limit_create_rate,
+    burst=app_settings.rate_limit_create_burst,
+    enabled=app_settings.rate_limit_enabled,
+)
+rate_limit_bulk = RateLimit(
+    "bulk",
+    rate_limit_backend,
+    rate=app_settings.rate_limit_bulk_rate,
+    burst=app_settings.rate_limit_bulk_burst,
+    enabled=app_settings.rate_limit_enabled,
+)
+rate_limit_transfer = RateLimit(
+    "transfer",
+    rate_limit_backend,
+    rate=app_settings.rate_limit_transfer_rate,
+    burst=app_settings.rate_limit_transfer_burst,
+    enabled=app_settings.rate_limit_enabled,
+)
@@ -0,0 +1,157 @@
+import asyncio
+from functools import lru_cache
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+from core.config import app_settings
+
+Connection = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class RespError(Exception):
+    """Error reply of a Redis-protocol server, or a lost connection."""
+
+
+# The server closed the connection: IncompleteReadError is an EOFError.
+CONNECTION_LOST = (EOFError, ConnectionError)
+# Everything a caller falling back to another source has to catch.
+REDIS_ERRORS = (OSError, asyncio.TimeoutError, RespError)
+
+
+def encode_command(*args: Any) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RespError(f"Unexpected reply: {line!r}")
+
+
+class RespClient:
+    """Minimal Redis-protocol client with a small connection pool.
+
+    Commands are sent as pipelines: one write and one round trip for any
+    number of commands. A connection that failed or timed out is closed
+    instead of being returned to the pool. A pooled connection the server
+    has closed in the meantime (on restart, after its ``timeout``) is
+    replaced and the pipeline sent again once; a lost connection is raised
+    as ``RespError``.
+    """
+
+    def __init__(self, url: str, *, max_connections: int, timeout: float):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle: list[Connection] = []
+
+    async def execute(self, *args: Any) -> Any:
+        [reply] = await self.pipeline(args)
+        return reply
+
+    async def pipeline(self, *commands: tuple) -> list[Any]:
+        """Run commands in order, raise the first error reply if any."""
+        async with self._slots:
+            pooled = self._idle.pop() if self._idle else None
+            try:
+                try:
+                    replies = await self._attempt(pooled, commands)
+                except CONNECTION_LOST:
+                    if pooled is None:
+                        raise
+                    replies = await self._attempt(None, commands)
+            except CONNECTION_LOST as error:
+                raise RespError(f"Connection lost: {error!r}") from error
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    async def _attempt(
+        self, connection: Connection | None, commands: tuple[tuple, ...]
+    ) -> list[Any]:
+        """Round trip on ``connection`` or a new one, then pool it."""
+        try:
+            if connection is None:
+                connection = await asyncio.wait_for(
+                    self._connect(), self.timeout
+                )
+            replies = await asyncio.wait_for(
+                self._roundtrip(connection, commands), self.timeout
+            )
+        except BaseException:
+            if connection is not None:
+                connection[1].close()
+            raise
+        self._idle.append(connection)
+        return replies
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def _connect(self) -> Connection:
+        connection = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password is not None:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        try:
+            for reply in await self._roundtrip(connection, setup):
+                if isinstance(reply, RespError):
+                    raise reply
+        except BaseException:
+            connection[1].close()
+            raise
+        return connection
+
+    @staticmethod
+    async def _roundtrip(
+        connection: Connection, commands: list[tuple] | tuple[tuple, ...]
+    ) -> list[Any]:
+        if not commands:
+            return []
+        reader, writer = connection
+        writer.write(b"".join(encode_command(*args) for args in commands))
+        await writer.drain()
+        return [await read_reply(reader) for _ in commands]
+
+
+@lru_cache
+def get_redis_client() -> RespClient:
+    """Client of REDIS_URL shared by the link cache and the rate limiter."""
+    return RespClient(
+        app_settings.redis_url,
+        max_connections=app_settings.redis_max_connections,
+        timeout=app_settings.redis_timeout,
+    )
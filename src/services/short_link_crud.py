@@ -1,18 +1,412 @@
+from datetime import datetime
+from functools import cached_property
+from typing import Any, AsyncIterator, NamedTuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import (CompoundSelect, Row, Select, false, func, select,
+                        true, union_all)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from models.short_link_model import ArchivedLink as ArchivedLinkModel
 from models.short_link_model import Link as LinkModel
 from models.short_link_model import Transfer as TransferModel
-from schemas.short_link_schema import (LinkCreate, LinkUpdate, TransferCreate,
-                                       TransferUpdate)
-from services.base_services import RepositoryDB
+from models.short_link_model import TransferRollup as TransferRollupModel
+from schemas.short_link_schema import (Granularity, LinkCreate, LinkUpdate,
+                                       TransferCreate, TransferUpdate)
+from services.base_services import BULK_CHUNK_SIZE, RepositoryDB, any_of
+from services.cache import link_cache
+from services.dedup import url_filter, url_hash
+from services.id_generator import id_generator
+
+STREAM_CHUNK_SIZE = 1000
+
+
+class ResolvedLink(NamedTuple):
+    original_url: str
+    deleted: bool
+    # Nullable: legacy rows may have none.
+    created_at: datetime | None
+    updated_at: datetime
+    key: int
+
+    def to_cache(self) -> list:
+        return [
+            self.original_url,
+            self.deleted,
+            self.created_at and self.created_at.isoformat(),
+            self.updated_at.isoformat(),
+            self.key,
+        ]
+
+    @classmethod
+    def from_cache(cls, value: list) -> "ResolvedLink":
+        original_url, deleted, created_at, updated_at, key = value
+        return cls(
+            original_url,
+            deleted,
+            created_at and datetime.fromisoformat(created_at),
+            datetime.fromisoformat(updated_at),
+            key,
+        )
+
+
+class CreateResult(NamedTuple):
+    link: LinkModel | None
+    # False when an existing link was reused in dedup mode.
+    created: bool
 
 
 class RepositoryLink(RepositoryDB[LinkModel, LinkCreate, LinkUpdate]):
-    pass
+    cursor_columns = ("created_at", "id")
+
+    @cached_property
+    def _lookup_statement(self) -> CompoundSelect:
+        table = LinkModel.__table__
+        archived = ArchivedLinkModel.__table__
+        return union_all(
+            select(
+                table.c.id,
+                table.c.original_url,
+                table.c.deleted,
+                table.c.created_at,
+                table.c.updated_at,
+                table.c.key,
+                false().label("archived"),
+            ).where(any_of(table.c.id, "b_ids")),
+            # Archived links are gone for good but still resolve as removed.
+            select(
+                archived.c.id,
+                archived.c.original_url,
+                true(),
+                archived.c.created_at,
+                archived.c.updated_at,
+                archived.c.key,
+                true(),
+            ).where(any_of(archived.c.id, "b_ids")),
+        )
+
+    @cached_property
+    def _archived_ids_statement(self) -> Select:
+        archived = ArchivedLinkModel.__table__
+        return select(archived.c.id).where(any_of(archived.c.id, "b_ids"))
+
+    async def lookup(
+        self, db: AsyncSession, id: str
+    ) -> ResolvedLink | None:
+        """Read only the columns of the link itself, bypassing the cache."""
+        found = await self.lookup_many(db, [id])
+        return found.get(id)
+
+    async def lookup_many(
+        self, db: AsyncSession, ids: list[str]
+    ) -> dict[str, ResolvedLink]:
+        """``lookup`` of many ids with one query; missing ids are left out."""
+        results = await db.execute(self._lookup_statement, {"b_ids": ids})
+        found = {}
+        for row in results:
+            # A live link wins over an archived one with the same id.
+            if row.archived and row.id in found:
+                continue
+            found[row.id] = ResolvedLink(
+                row.original_url,
+                bool(row.deleted),
+                row.created_at,
+                row.updated_at,
+                row.key,
+            )
+        return found
+
+    async def resolve(
+        self, db: AsyncSession, id: str
+    ) -> ResolvedLink | None:
+        """``lookup`` through the link cache, "not found" included.
+
+        ``db`` must be a primary session: a replica may lag behind, and
+        what it reads would be cached for every worker until the TTL, even
+        after the ``invalidate`` of a change or a create.
+        """
+        cached = await link_cache.get(id)
+        if cached.hit:
+            if cached.value is None:
+                return None
+            return ResolvedLink.from_cache(cached.value)
+        resolved = await self.lookup(db, id)
+        await link_cache.set(
+            id, resolved and resolved.to_cache(), cached.version
+        )
+        return resolved
+
+    async def resolve_many(
+        self, db: AsyncSession, ids: list[str]
+    ) -> dict[str, ResolvedLink | None]:
+        """``resolve`` of many ids: one cache round trip and one query.
+
+        ``db`` must be a primary session, as for ``resolve``.
+        """
+        ids = list(dict.fromkeys(ids))
+        resolved = {}
+        versions = {}
+        for id, cached in zip(ids, await link_cache.get_many(ids)):
+            if not cached.hit:
+                versions[id] = cached.version
+            elif cached.value is None:
+                resolved[id] = None
+            else:
+                resolved[id] = ResolvedLink.from_cache(cached.value)
+        if versions:
+            found = await self.lookup_many(db, list(versions))
+            for id in versions:
+                resolved[id] = found.get(id)
+            await link_cache.set_many(
+                [
+                    (id, resolved[id] and resolved[id].to_cache(), version)
+                    for id, version in versions.items()
+                ]
+            )
+        return resolved
+
+    async def create(
+        self, db: AsyncSession, *, obj_in: LinkCreate
+    ) -> LinkModel:
+        """Insert a link, retrying with a new id if the id is taken."""
+        [result] = await self.bulk_create(db, obj_in=[obj_in])
+        return self._created_or_conflict(result).link
+
+    async def get_or_create(
+        self, db: AsyncSession, *, obj_in: LinkCreate
+    ) -> CreateResult:
+        """Reuse the live link of the same URL or create a new one."""
+        [result] = await self.bulk_create(db, obj_in=[obj_in], dedup=True)
+        return self._created_or_conflict(result)
+
+    async def bulk_create(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: list[LinkCreate],
+        dedup: bool = False,
+    ) -> list[CreateResult]:
+        """Insert links in chunks, one INSERT ... RETURNING per chunk.
+
+        The result is aligned with ``obj_in``. Items whose ids kept
+        colliding after all attempts get no link instead of failing the
+        whole batch. With ``dedup`` an item whose URL already has a live
+        canonical link (in the DB or earlier in ``obj_in``) reuses it.
+        """
+        obj_in_data = jsonable_encoder(obj_in)
+        results = [CreateResult(None, False)] * len(obj_in_data)
+        pending = list(range(len(obj_in_data)))
+        aliases = {}
+        if dedup:
+            pending, aliases = await self._dedup_pending(
+                db, obj_in_data, results
+            )
+        for _ in range(app_settings.short_link_max_attempts):
+            retry = []
+            for start in range(0, len(pending), BULK_CHUNK_SIZE):
+                retry.extend(
+                    await self._insert_chunk(
+                        db,
+                        obj_in_data,
+                        results,
+                        pending[start:start + BULK_CHUNK_SIZE],
+                    )
+                )
+            if dedup and retry:
+                # Not inserted: either the id or the URL is already taken.
+                retry = await self._reuse_existing(
+                    db, obj_in_data, results, retry
+                )
+            pending = sorted(retry)
+            if not pending:
+                break
+        await db.commit()
+        # New ids may have been cached as "not found".
+        await link_cache.discard(
+            *(result.link.id for result in results if result.created)
+        )
+        for index, canonical in aliases.items():
+            if index != canonical:
+                results[index] = CreateResult(results[canonical].link, False)
+        return results
+
+    async def _dedup_pending(
+        self,
+        db: AsyncSession,
+        obj_in_data: list[dict],
+        results: list[CreateResult],
+    ) -> tuple[list[int], dict[int, int]]:
+        """Hash the URLs and reuse known links.
+
+        Returns the indexes still to insert and the index of the first item
+        with the same URL for every item.
+        """
+        aliases = {}
+        first_index = {}
+        for index, data in enumerate(obj_in_data):
+            data["url_hash"] = url_hash(data["original_url"])
+            aliases[index] = first_index.setdefault(data["url_hash"], index)
+        # Only URLs the filter may have seen are worth a lookup.
+        seen, unseen = [], []
+        for index in sorted(first_index.values()):
+            if obj_in_data[index]["url_hash"] in url_filter:
+                seen.append(index)
+            else:
+                unseen.append(index)
+        pending = unseen + await self._reuse_existing(
+            db, obj_in_data, results, seen
+        )
+        return pending, aliases
+
+    async def _insert_chunk(
+        self,
+        db: AsyncSession,
+        obj_in_data: list[dict],
+        results: list[CreateResult],
+        chunk: list[int],
+    ) -> list[int]:
+        """Insert a chunk with fresh ids, return the indexes not inserted."""
+        skipped = []
+        indexes = {}
+        for index in chunk:
+            id = await id_generator.next_id(db)
+            if id in indexes:
+                skipped.append(index)
+            else:
+                indexes[id] = index
+        if indexes:
+            # The id of an archived link must not point to another URL,
+            # whatever generator made it.
+            archived = await db.scalars(
+                self._archived_ids_statement, {"b_ids": list(indexes)}
+            )
+            for id in archived:
+                skipped.append(indexes.pop(id))
+            if not indexes:
+                return skipped
+        statement = (
+            pg_insert(LinkModel)
+            .values(
+                [
+                    {"id": id, **obj_in_data[index]}
+                    for id, index in indexes.items()
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(LinkModel)
+        )
+        inserted = await db.execute(statement=statement)
+        for link in inserted.scalars().all():
+            results[indexes.pop(link.id)] = CreateResult(link, True)
+            if link.url_hash:
+                url_filter.add(link.url_hash)
+        return skipped + list(indexes.values())
+
+    async def _reuse_existing(
+        self,
+        db: AsyncSession,
+        obj_in_data: list[dict],
+        results: list[CreateResult],
+        pending: list[int],
+    ) -> list[int]:
+        """Attach live links with the same URL, return the rest."""
+        by_hash = {obj_in_data[index]["url_hash"]: index for index in pending}
+        hashes = list(by_hash)
+        for start in range(0, len(hashes), BULK_CHUNK_SIZE):
+            statement = select(LinkModel).where(
+                LinkModel.url_hash.in_(hashes[start:start + BULK_CHUNK_SIZE]),
+                LinkModel.deleted.isnot(True),
+            )
+            existing = await db.execute(statement=statement)
+            for link in existing.scalars().all():
+                results[by_hash.pop(link.url_hash)] = CreateResult(
+                    link, False
+                )
+                url_filter.add(link.url_hash)
+        return list(by_hash.values())
+
+    @staticmethod
+    def _created_or_conflict(result: CreateResult) -> CreateResult:
+        if result.link is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Could not generate a unique short link",
+            )
+        return result
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: LinkModel | Row,
+        obj_in: LinkUpdate | dict[str, Any],
+    ) -> Row:
+        # A changed URL no longer makes the link canonical for dedup.
+        obj_in_data = {**jsonable_encoder(obj_in), "url_hash": None}
+        link = await super().update(db, db_obj=db_obj, obj_in=obj_in_data)
+        await link_cache.invalidate(link.id)
+        return link
+
+    async def delete(
+        self, db: AsyncSession, *, db_obj: LinkModel | Row
+    ) -> Row:
+        link = await super().delete(db, db_obj=db_obj)
+        await link_cache.invalidate(link.id)
+        return link
 
 
 class RepositoryTransfer(
     RepositoryDB[TransferModel, TransferCreate, TransferUpdate]
 ):
-    pass
+    async def stream_for_link(
+        self,
+        db: AsyncSession,
+        link_key: int,
+        *,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> AsyncIterator[Row]:
+        """Yield ``(date, client_host)`` rows from a server-side cursor."""
+        statement = (
+            select(
+                TransferModel.date,
+                func.host(TransferModel.client_host).label("client_host"),
+            )
+            .where(TransferModel.link_key == link_key)
+            .order_by(TransferModel.date, TransferModel.id)
+            .offset(offset)
+            .limit(limit)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        results = await db.stream(statement)
+        async for row in results:
+            yield row
+
+    async def get_rollups(
+        self,
+        db: AsyncSession,
+        *,
+        link_id: str,
+        granularity: Granularity,
+        date_from: datetime,
+        date_to: datetime,
+    ) -> list[TransferRollupModel]:
+        """Non-empty buckets of ``granularity`` in [date_from, date_to)."""
+        statement = (
+            select(TransferRollupModel)
+            .where(
+                TransferRollupModel.link_id == link_id,
+                TransferRollupModel.granularity == granularity.value,
+                TransferRollupModel.bucket >= granularity.truncate(date_from),
+                TransferRollupModel.bucket < date_to,
+            )
+            .order_by(TransferRollupModel.bucket)
+        )
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
 
 
 link_crud = RepositoryLink(LinkModel)
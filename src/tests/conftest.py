@@ -3,8 +3,21 @@ import pytest_asyncio
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from core.config import app_settings
 from db.database import Base, engine
 from main import app
+from services.cache import link_cache
+from services.rate_limit import (MemoryRateLimitBackend, rate_limit_bulk,
+                                 rate_limit_create, rate_limit_transfer)
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_buckets(monkeypatch: pytest.MonkeyPatch):
+    # Каждый тест начинает с полными корзинами токенов: иначе лимит
+    # зависел бы от числа запросов в предыдущих тестах и их порядка.
+    backend = MemoryRateLimitBackend(app_settings.rate_limit_max_clients)
+    for limit in (rate_limit_create, rate_limit_bulk, rate_limit_transfer):
+        monkeypatch.setattr(limit, "backend", backend)
 
 
 @pytest_asyncio.fixture
@@ -16,6 +29,7 @@ async def async_client():
 @pytest_asyncio.fixture(scope="function")
 async def async_session() -> AsyncSession:
     session = async_sessionmaker(engine, expire_on_commit=False)
+    await link_cache.clear()
 
     async with session():
         async with engine.begin() as connect:
@@ -0,0 +1,221 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import engine
+from services.cache import (FakeBackend, LRUCache, MemoryBackend,
+                            RedisBackend, VersionedCache, link_cache)
+from services.click_recorder import click_recorder
+from services.resp import RespClient, RespError, encode_command, read_reply
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # "a" становится самым свежим, вытесняется "b"
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_ttl_and_delete():
+    cache = LRUCache(maxsize=10, ttl=5)
+    with patch("services.cache.monotonic", return_value=100):
+        cache.set("a", 1)
+        cache.set("b", 2)
+    with patch("services.cache.monotonic", return_value=104):
+        assert cache.get("a") == 1
+    with patch("services.cache.monotonic", return_value=106):
+        assert cache.get("a") is None
+    cache.delete("b")
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache_shared_backend():
+    # Два «воркера» с общим хранилищем, как с общим Redis.
+    store = {}
+    first = VersionedCache(FakeBackend(store), ttl=60, negative_ttl=5)
+    second = VersionedCache(FakeBackend(store), ttl=60, negative_ttl=5)
+
+    cached = await first.get("abc")
+    assert not cached.hit
+    await first.set("abc", ["http://a.ru", False], cached.version)
+    assert await second.get("abc") == (True, ["http://a.ru", False], 0)
+
+    # Устаревшее значение, прочитанное до изменения, не попадает в кэш.
+    stale = await first.get("abc")
+    await second.invalidate("abc")
+    await first.set("abc", ["http://a.ru", False], stale.version)
+    cached = await first.get("abc")
+    assert not cached.hit
+    assert cached.version == 1
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache_negative():
+    cache = VersionedCache(FakeBackend(), ttl=60, negative_ttl=5)
+    with patch("services.cache.monotonic", return_value=100):
+        cached = await cache.get("missing")
+        await cache.set("missing", None, cached.version)
+        assert await cache.get("missing") == (True, None, 0)
+    with patch("services.cache.monotonic", return_value=106):
+        assert not (await cache.get("missing")).hit
+    assert cache.stats()["negative_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache_counters():
+    backend = MemoryBackend(maxsize=10, ttl=60)
+    cache = VersionedCache(backend, ttl=60, negative_ttl=5)
+    with patch("services.cache.monotonic", return_value=100):
+        for key in ("a", "b"):
+            await cache.set(key, [key], 0)
+        # Счётчики версий не вытесняют закэшированные ссылки
+        await cache.invalidate(*(f"key{n}" for n in range(100)))
+        assert (await cache.get("a")).hit
+        assert (await cache.get("key1")).version == 1
+        # Для новых ключей счётчик не заводится
+        await cache.set("new", None, 0)
+        await cache.discard("new")
+        assert not (await cache.get("new")).hit
+        assert backend.stats()["counters"] == 100
+    # Счётчик живёт дважды дольше самой долгой записи
+    with patch("services.cache.monotonic", return_value=221):
+        assert (await cache.get("key1")).version == 0
+        await cache.invalidate("b")
+        assert backend.stats()["counters"] == 1
+
+
+class RecordingClient:
+    def __init__(self):
+        self.commands = []
+
+    async def pipeline(self, *commands):
+        self.commands.extend(commands)
+        return [1] * len(commands)
+
+
+@pytest.mark.asyncio
+async def test_redis_counters_expire():
+    client = RecordingClient()
+    cache = VersionedCache(
+        RedisBackend(client, "test:"), ttl=60, negative_ttl=5
+    )
+    await cache.backend.incr("n:a", ttl=cache.version_ttl)
+    assert client.commands == [
+        ("INCR", "test:n:a"),
+        ("PEXPIRE", "test:n:a", 120_000),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_resp_protocol():
+    assert encode_command("SET", "k", b"v", 10) == (
+        b"*4\r\n$3\r\nSET\r\n$1\r\nk\r\n$1\r\nv\r\n$2\r\n10\r\n"
+    )
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"*3\r\n$2\r\nok\r\n$-1\r\n:7\r\n-ERR wrong\r\n")
+    assert await read_reply(reader) == [b"ok", None, 7]
+    assert isinstance(await read_reply(reader), RespError)
+
+
+async def start_dropping_server(replies: int) -> tuple[asyncio.Server, list]:
+    """Сервер отвечает PONG на ``replies`` команд и закрывает соединение."""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        for _ in range(replies):
+            await reader.read(1024)
+            writer.write(b"+PONG\r\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, connections
+
+
+@pytest.mark.asyncio
+async def test_resp_connection_dropped():
+    server, connections = await start_dropping_server(replies=1)
+    port = server.sockets[0].getsockname()[1]
+    client = RespClient(
+        f"redis://127.0.0.1:{port}", max_connections=1, timeout=1
+    )
+    async with server:
+        assert await client.execute("PING") == "PONG"
+        await asyncio.sleep(0.05)
+        # Закрытое сервером соединение из пула заменяется новым
+        assert await client.execute("PING") == "PONG"
+        assert len(connections) == 2
+        await client.close()
+
+    server, _ = await start_dropping_server(replies=0)
+    port = server.sockets[0].getsockname()[1]
+    client = RespClient(
+        f"redis://127.0.0.1:{port}", max_connections=1, timeout=1
+    )
+    async with server:
+        with pytest.raises(RespError):
+            await client.execute("PING")
+        # Кэш считает это промахом, а не ошибкой запроса
+        cache = VersionedCache(
+            RedisBackend(client, "test:"), ttl=60, negative_ttl=5
+        )
+        assert not (await cache.get("key")).hit
+        assert cache.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transfer_not_found_is_cached(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    for _ in range(2):
+        response = await async_client.get(f"{prefix_shorten}/transfer/nope")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert link_cache.stats()["negative_hits"] == 1
+
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    id = response.json()["id"]
+    response = await async_client.get(f"{prefix_shorten}/{id}")
+    assert response.json()["original_url"] == link_test_data["full_url"]
+
+    # После удаления кэш не отдаёт старое состояние ссылки.
+    response = await async_client.delete(f"{prefix_shorten}/{id}")
+    response = await async_client.get(f"{prefix_shorten}/{id}")
+    assert response.json()["deleted"] is True
+
+
+@pytest.mark.asyncio
+async def test_transfer_without_created_at_is_cached(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    prefix_shorten: str,
+):
+    async with engine.begin() as connect:
+        await connect.execute(
+            text(
+                "INSERT INTO link (id, original_url, created_at) "
+                "VALUES ('old', 'http://old.ru', NULL)"
+            )
+        )
+    # Старая ссылка без даты создания кэшируется и читается из кэша.
+    for _ in range(2):
+        response = await async_client.get(f"{prefix_shorten}/transfer/old")
+        assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert link_cache.stats()["hits"] == 1
+    await click_recorder.drain()
@@ -0,0 +1,165 @@
+from datetime import date
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import engine
+from db.partitions import maintain_partitions
+from services.cache import link_cache
+from services.click_recorder import click_recorder
+from services.compaction import LinkCompactor
+from services.id_generator import id_generator
+
+
+async def count(table: str) -> int:
+    async with engine.connect() as connect:
+        return await connect.scalar(text(f"SELECT count(*) FROM {table}"))
+
+
+@pytest.mark.asyncio
+async def test_compaction(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    prefix_shorten: str,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    ids = []
+    for url in ("one.com", "two.com", "three.com"):
+        response = await async_client.post(
+            prefix_shorten, json={"original_url": url}
+        )
+        ids.append(response.json()["id"])
+    old, recent, live = ids
+    for id in (old, recent):
+        await async_client.delete(f"{prefix_shorten}/{id}")
+    async with engine.begin() as connect:
+        await connect.execute(
+            text(
+                "UPDATE link SET transfer_count = 5, "
+                "updated_at = updated_at - interval '40 days' WHERE id = :id"
+            ),
+            {"id": old},
+        )
+        await connect.execute(
+            text(
+                "INSERT INTO transfer (date, client_host, link_key) "
+                "SELECT now(), '10.0.0.1', key "
+                "FROM link, generate_series(1, 5) WHERE id = :id"
+            ),
+            {"id": old},
+        )
+        await connect.execute(
+            text(
+                "INSERT INTO transfer_rollup "
+                "VALUES (:id, 'day', '2030-01-01', 5)"
+            ),
+            {"id": old},
+        )
+
+    response = await async_client.get(f"{prefix_shorten}?live=true")
+    assert [link["id"] for link in response.json()] == [live]
+
+    compactor = LinkCompactor(
+        engine, after_days=30, batch_size=1, transfer_batch_size=2, interval=0
+    )
+    assert await compactor.run_once(dry_run=True) == {
+        "links": 1, "transfers": 5
+    }
+    # Ссылку, которую сейчас меняет запрос, компактизация пропускает
+    async with engine.begin() as connect:
+        await connect.execute(
+            text("SELECT 1 FROM link WHERE id = :id FOR UPDATE"), {"id": old}
+        )
+        assert await compactor.run_once() == {"links": 0, "transfers": 0}
+    assert await compactor.run_once() == {"links": 1, "transfers": 5}
+    assert await compactor.run_once() == {"links": 0, "transfers": 0}
+    assert await count("archived_link") == 1
+    assert await count("archived_transfer") == 5
+    assert await count("transfer") == 0
+    assert await count("transfer_rollup") == 0
+
+    response = await async_client.get(prefix_shorten)
+    assert sorted(link["id"] for link in response.json()) == sorted(
+        [recent, live]
+    )
+    # Архивная ссылка по-прежнему считается удалённой
+    await link_cache.clear()
+    response = await async_client.get(f"{prefix_shorten}/transfer/{old}")
+    assert response.status_code == status.HTTP_410_GONE
+
+    # Идентификатор архивной ссылки не выдаётся повторно
+    generated = iter([old, "fresh1"])
+
+    async def next_id(db):
+        return next(generated)
+
+    monkeypatch.setattr(id_generator, "next_id", next_id)
+    response = await async_client.post(
+        prefix_shorten, json={"original_url": "four.com"}
+    )
+    assert response.json()["id"] == "fresh1"
+    # Живая ссылка важнее архивной с тем же идентификатором
+    async with engine.begin() as connect:
+        await connect.execute(
+            text(
+                "INSERT INTO archived_link (id, key, original_url, "
+                "updated_at, transfer_count) "
+                "VALUES ('fresh1', -1, 'http://old.com', now(), 0)"
+            )
+        )
+    await link_cache.clear()
+    response = await async_client.get(f"{prefix_shorten}/transfer/fresh1")
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    await click_recorder.drain()
+
+
+@pytest.mark.asyncio
+async def test_compaction_after_detach(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    prefix_shorten: str,
+):
+    response = await async_client.post(
+        prefix_shorten, json={"original_url": "old.com"}
+    )
+    id = response.json()["id"]
+    await async_client.delete(f"{prefix_shorten}/{id}")
+    async with engine.begin() as connect:
+        await connect.execute(
+            text(
+                "UPDATE link SET updated_at = updated_at - interval '40 days' "
+                "WHERE id = :id"
+            ),
+            {"id": id},
+        )
+        await connect.execute(
+            text(
+                "INSERT INTO transfer (date, client_host, link_key) "
+                "SELECT '2030-01-20', '10.0.0.1', key FROM link WHERE id = :id"
+            ),
+            {"id": id},
+        )
+        for today in (date(2030, 1, 15), date(2030, 3, 10)):
+            await maintain_partitions(
+                connect,
+                today=today,
+                ahead=0,
+                retention_months=1,
+                action="detach",
+            )
+
+    # Отсоединённая секция не мешает архивировать ссылку
+    compactor = LinkCompactor(
+        engine,
+        after_days=30,
+        batch_size=10,
+        transfer_batch_size=10,
+        interval=0,
+    )
+    assert await compactor.run_once() == {"links": 1, "transfers": 0}
+    assert await count("transfer_archive_203001") == 1
+    async with engine.begin() as connect:
+        await connect.execute(text("DROP TABLE transfer_archive_203001"))
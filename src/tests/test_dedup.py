@@ -0,0 +1,66 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.dedup import BloomFilter, normalize_url
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Yandex.RU:80") == "http://yandex.ru/"
+    assert normalize_url("https://a.b:8443/X?q=1") == "https://a.b:8443/X?q=1"
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000)
+    keys = [f"key{number}" for number in range(1000)]
+    for key in keys[:500]:
+        bloom.add(key)
+    assert all(key in bloom for key in keys[:500])
+    false_positives = sum(key in bloom for key in keys[500:])
+    assert false_positives < 50
+
+
+@pytest.mark.asyncio
+async def test_create_link_dedup(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    params = {"dedup": True}
+    response = await async_client.post(
+        prefix_shorten, params=params, json=link_test_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    link_id = response.json()["id"]
+
+    # Повторное сокращение возвращает ту же ссылку
+    response = await async_client.post(
+        prefix_shorten, params=params, json={"original_url": "YANDEX.ru"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == link_id
+
+    # Без dedup создаётся новая ссылка
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] != link_id
+
+    # Пакетное создание с повтором внутри пакета
+    response = await async_client.post(
+        f"{prefix_shorten}/bulk",
+        params={"dedup": True, "report": True},
+        json=[link_test_data, {"original_url": "new.com"},
+              {"original_url": "new.com"}],
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    report = response.json()
+    assert [item["created"] for item in report] == [False, True, False]
+    assert report[0]["link"]["id"] == link_id
+    assert report[1]["link"]["id"] == report[2]["link"]["id"]
+
+    # Удалённая ссылка больше не используется повторно
+    await async_client.delete(f"{prefix_shorten}/{link_id}")
+    response = await async_client.post(
+        prefix_shorten, params=params, json=link_test_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] != link_id
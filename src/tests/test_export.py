@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import engine, replica_router
+from db.replicas import Replica
+from services.export import TransferExporter
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+async def add_transfers(*dates: datetime) -> None:
+    async with engine.begin() as connect:
+        await connect.execute(
+            text(
+                "INSERT INTO transfer (date, client_host, link_key) "
+                "SELECT :date, '10.0.0.1', key FROM link WHERE id = 'e'"
+            ),
+            [{"date": date} for date in dates],
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_closed_days(async_session: AsyncSession, tmp_path):
+    async with engine.begin() as connect:
+        await connect.execute(
+            text("INSERT INTO link (id, original_url) VALUES ('e', 'http://')")
+        )
+    await add_transfers(
+        datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 11),
+        datetime(2030, 1, 3, 12), datetime(2030, 1, 4, 1),
+    )
+    exporter = TransferExporter(
+        tmp_path, export_format="parquet", delay=3600, interval=0
+    )
+
+    # 4 января ещё не закрыто: прошло меньше часа с его конца.
+    written = await exporter.export(datetime(2030, 1, 5, 0, 30))
+    assert [path.name for path in written] == [
+        "transfer-2030-01-01.parquet",
+        "transfer-2030-01-03.parquet",
+    ]
+    table = pq.read_table(written[0])
+    assert table.column("client_host").to_pylist() == ["10.0.0.1"] * 2
+    assert table.column("link_id").to_pylist() == ["e"] * 2
+    assert exporter.read_high_water_mark() == datetime(2030, 1, 4)
+
+    # Повторный запуск продолжает с отметки.
+    exporter.export_format = "arrow"
+    written = await exporter.export(datetime(2030, 1, 5, 2))
+    assert [path.name for path in written] == ["transfer-2030-01-04.arrow"]
+    with pa.ipc.open_file(written[0]) as reader:
+        assert reader.read_all().num_rows == 1
+    assert await exporter.export(datetime(2030, 1, 5, 2)) == []
+
+
+@pytest.mark.asyncio
+async def test_export_first_day_and_archive(
+    async_session: AsyncSession, tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    async with engine.begin() as connect:
+        await connect.execute(
+            text("INSERT INTO link (id, original_url) VALUES ('e', 'http://')")
+        )
+        await connect.execute(
+            text(
+                "INSERT INTO archived_link (id, key, original_url, "
+                "updated_at, transfer_count) "
+                "VALUES ('gone', -1, 'http://', now(), 1)"
+            )
+        )
+        await connect.execute(
+            text(
+                "INSERT INTO archived_transfer (id, date, link_key) "
+                "VALUES (-1, '2030-01-02 08:00', -1)"
+            )
+        )
+    await add_transfers(datetime(1970, 1, 1), datetime(2030, 1, 2, 9))
+    exporter = TransferExporter(
+        tmp_path, export_format="parquet", delay=0, interval=0
+    )
+
+    # Реплика, ещё ничего не воспроизводившая, ничего не выгружает.
+    replica = Replica(engine, retry_interval=60)
+    monkeypatch.setattr(replica_router, "choose", lambda: replica)
+    assert await exporter.export(datetime(2030, 1, 3)) == []
+    assert exporter.read_high_water_mark() is None
+    monkeypatch.undo()
+
+    # Переходы без даты пропускаются, архивные выгружаются вместе с живыми.
+    written = await exporter.export(datetime(2030, 1, 3))
+    assert [path.name for path in written] == ["transfer-2030-01-02.parquet"]
+    table = pq.read_table(written[0])
+    assert table.column("link_id").to_pylist() == ["gone", "e"]
@@ -0,0 +1,88 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from services.click_recorder import click_recorder
+
+
+@pytest.mark.asyncio
+async def test_conditional_reads(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    link_id = response.json()["id"]
+    link_url = f"{prefix_shorten}/{link_id}"
+
+    # Ссылка отдается с валидаторами
+    response = await async_client.get(link_url)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    last_modified = response.headers["Last-Modified"]
+
+    # Совпадающий ETag или дата - 304 без тела
+    response = await async_client.get(
+        link_url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    response = await async_client.get(
+        link_url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # После изменения ссылки старый ETag не подходит
+    await async_client.put(link_url, json={"original_url": "ya.ru"})
+    response = await async_client.get(
+        link_url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+    # Статус меняется с каждым записанным переходом
+    response = await async_client.get(f"{link_url}/status")
+    status_etag = response.headers["ETag"]
+    response = await async_client.get(
+        f"{prefix_shorten}/status", params={"full-info": ""})
+    list_etag = response.headers["ETag"]
+    await async_client.get(f"{prefix_shorten}/transfer/{link_id}")
+    await click_recorder.drain()
+    response = await async_client.get(
+        f"{link_url}/status", headers={"If-None-Match": status_etag})
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.get(
+        f"{prefix_shorten}/status",
+        params={"full-info": ""},
+        headers={"If-None-Match": list_etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.get(
+        f"{prefix_shorten}/status",
+        params={"full-info": ""},
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.asyncio
+async def test_permanent_redirect(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(app_settings, "redirect_permanent", True)
+    monkeypatch.setattr(
+        app_settings, "redirect_cache_control", "public, max-age=3600")
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    link_id = response.json()["id"]
+
+    # Кешируемый постоянный редирект
+    response = await async_client.get(f"{prefix_shorten}/transfer/{link_id}")
+    assert response.status_code == status.HTTP_301_MOVED_PERMANENTLY
+    assert response.headers["Cache-Control"] == "public, max-age=3600"
+    await click_recorder.drain()
@@ -0,0 +1,84 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.short_link_model import SHORT_LINK_ALPHABET
+from services.id_generator import RandomIdGenerator, SequenceIdGenerator
+
+
+@pytest.mark.asyncio
+async def test_random_id_generator():
+    generator = RandomIdGenerator(length=6)
+    short_id = await generator.next_id(db=None)
+    assert len(short_id) == 6
+    assert set(short_id) <= set(SHORT_LINK_ALPHABET)
+
+
+def test_sequence_id_generator_is_bijective():
+    generator = SequenceIdGenerator(length=2, block_size=10)
+    ids = {generator.id_for(number) for number in range(generator.keyspace)}
+    assert len(ids) == generator.keyspace
+    with pytest.raises(ValueError):
+        generator.id_for(generator.keyspace)
+
+
+@pytest.mark.asyncio
+async def test_sequence_id_generator_blocks(async_session: AsyncSession):
+    generator = SequenceIdGenerator(length=6, block_size=2)
+    async with async_session() as db:
+        # Три идентификатора занимают два блока последовательности
+        ids = [await generator.next_id(db) for _ in range(3)]
+    assert len(set(ids)) == 3
+    assert ids[:2] == [generator.id_for(0), generator.id_for(1)]
+    assert ids[2] == generator.id_for(2)
+
+
+@pytest.mark.asyncio
+async def test_create_retries_on_collision(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    taken_id = response.json()["id"]
+
+    # Первый сгенерированный идентификатор уже занят
+    generator = AsyncMock(side_effect=[taken_id, "fresh1"])
+    with patch("services.short_link_crud.id_generator.next_id", generator):
+        response = await async_client.post(
+            prefix_shorten, json=link_test_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] == "fresh1"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_reports_partial_success(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    link_bulk_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    taken_id = response.json()["id"]
+
+    # Для второй ссылки генератор всё время возвращает занятый идентификатор
+    generator = AsyncMock(
+        side_effect=["fresh1", taken_id, "fresh3"] + [taken_id] * 10
+    )
+    with patch("services.short_link_crud.id_generator.next_id", generator):
+        response = await async_client.post(
+            f"{prefix_shorten}/bulk",
+            params={"report": True},
+            json=link_bulk_test_data,
+        )
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    report = response.json()
+    assert [item["created"] for item in report] == [True, False, True]
+    assert report[0]["link"]["id"] == "fresh1"
+    assert report[1]["link"] is None
+    assert report[2]["link"]["original_url"] == "http://three.com"
@@ -1,8 +1,15 @@
+import asyncio
+
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import app_settings
+from schemas.short_link_schema import TransferCreate
+from services.click_recorder import ClickRecorder, click_recorder
+from services.short_link_crud import link_crud
+
 
 @pytest.mark.asyncio
 async def test_short_link(
@@ -38,6 +45,38 @@ async def test_short_link(
     assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
     assert response.next_request.url == link_test_data["full_url"]
 
+    # Переход записан после сброса очереди
+    await click_recorder.drain()
+    response = await async_client.get(f"{prefix_shorten}/{link_id}/status")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["transfer_count"] == 1
+
+    # Статистика переходов по часам
+    response = await async_client.get(
+        f"{prefix_shorten}/{link_id}/stats", params={"granularity": "hour"})
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()
+    assert stats["total"] == 1
+    assert [bucket["count"] for bucket in stats["buckets"]] == [1]
+
+    # Полная информация с постраничным списком переходов
+    response = await async_client.get(
+        f"{prefix_shorten}/{link_id}/status", params={"full-info": ""})
+    assert response.status_code == status.HTTP_200_OK
+    full_info = response.json()
+    assert full_info["id"] == link_id
+    assert len(full_info["transfer"]) == 1
+    assert full_info["transfer"][0]["client_host"] == "127.0.0.1"
+    response = await async_client.get(
+        f"{prefix_shorten}/{link_id}/status",
+        params={"full-info": "", "offset": 1},
+    )
+    assert response.json()["transfer"] == []
+    response = await async_client.get(
+        f"{prefix_shorten}/status", params={"full-info": ""})
+    assert response.status_code == status.HTTP_200_OK
+    assert [len(link["transfer"]) for link in response.json()] == [1]
+
     # Удалить (пометить как удаленная) ссылку
     response = await async_client.delete(f"{prefix_shorten}/{link_id}")
     assert response.status_code == status.HTTP_200_OK
@@ -68,3 +107,112 @@ async def test_short_link_bulk_create(
     links = await async_client.get(prefix_shorten)
     assert empty_links.status_code == status.HTTP_200_OK
     assert len(links.json()) == len(link_bulk_test_data)
+
+
+@pytest.mark.asyncio
+async def test_short_link_cursor_pagination(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_bulk_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(
+        f"{prefix_shorten}/bulk", json=link_bulk_test_data)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # Первая страница возвращает курсор следующей
+    response = await async_client.get(prefix_shorten, params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    first_page = response.json()
+    assert len(first_page) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    # Последняя страница без курсора
+    response = await async_client.get(
+        prefix_shorten, params={"limit": 2, "cursor": cursor})
+    assert response.status_code == status.HTTP_200_OK
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    ids = {link["id"] for link in first_page + second_page}
+    assert len(ids) == len(link_bulk_test_data)
+
+    # Курсор работает и для статистики
+    response = await async_client.get(
+        f"{prefix_shorten}/status", params={"max-result": 2})
+    assert response.headers["X-Next-Cursor"] == cursor
+
+    # Испорченный курсор
+    response = await async_client.get(
+        prefix_shorten, params={"cursor": "broken"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_resolve_links(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_bulk_test_data: list[dict],
+    prefix_shorten: str,
+):
+    response = await async_client.post(
+        f"{prefix_shorten}/bulk", json=link_bulk_test_data)
+    ids = [link["id"] for link in response.json()]
+    await async_client.delete(f"{prefix_shorten}/{ids[1]}")
+
+    # Результат в порядке запроса, неизвестные помечены missing
+    request = {"ids": [ids[2], "unknown", ids[0], ids[1], ids[2]]}
+    for _ in range(2):
+        # Второй запрос обслуживается кешем
+        response = await async_client.post(
+            f"{prefix_shorten}/resolve", json=request)
+        assert response.status_code == status.HTTP_200_OK
+        got = response.json()
+        assert [link["id"] for link in got] == request["ids"]
+        assert got[0]["original_url"] == "http://three.com"
+        assert got[1] == {
+            "id": "unknown",
+            "original_url": None,
+            "deleted": None,
+            "missing": True,
+        }
+        assert [link["deleted"] for link in got[2:]] == [False, True, False]
+
+    # Слишком много id
+    response = await async_client.post(
+        f"{prefix_shorten}/resolve",
+        json={"ids": ["x"] * (app_settings.link_resolve_max_ids + 1)},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_click_recorder_stop(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    recorder = ClickRecorder(maxsize=10, batch_size=10, flush_interval=60)
+    # Остановка не зависает, пока запись ждёт пустую очередь
+    await recorder.start()
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(recorder.stop(), 1)
+    assert not recorder.running
+
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    link_id = response.json()["id"]
+    async with async_session() as db:
+        link = await link_crud.lookup(db, link_id)
+
+    # И пока она ждёт остальную пачку. Переход, пришедший вместе с
+    # остановкой, завершает ожидание, и wait_for до Python 3.12 теряет
+    # отмену: запись должна остановиться по флагу.
+    click = TransferCreate(client_host="10.0.0.1", link_id=link_id)
+    await recorder.start()
+    recorder.record(click, link.key)
+    await asyncio.sleep(0.01)
+    recorder.record(click, link.key)
+    await asyncio.wait_for(recorder.stop(), 1)
+    assert not recorder.running
+    assert recorder.recorded == 2
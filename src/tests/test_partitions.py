@@ -0,0 +1,74 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import engine
+from db.partitions import (add_months, list_partitions, maintain_partitions,
+                           partition_month)
+
+
+def test_partition_months():
+    assert add_months(date(2030, 11, 1), 3) == date(2031, 2, 1)
+    assert add_months(date(2030, 1, 1), -1) == date(2029, 12, 1)
+    assert partition_month("transfer_p203002") == date(2030, 2, 1)
+    assert partition_month("transfer_default") is None
+
+
+@pytest.mark.asyncio
+async def test_maintain_partitions(async_session: AsyncSession):
+    async with engine.begin() as connect:
+        await connect.execute(
+            text("INSERT INTO link (id, original_url) VALUES ('p', 'http://')")
+        )
+        # Переходы без своей секции попадают в секцию по умолчанию.
+        await connect.execute(
+            text(
+                "INSERT INTO transfer (date, client_host, link_key) "
+                "SELECT :date, '127.0.0.1', key FROM link WHERE id = 'p'"
+            ),
+            [{"date": datetime(2030, 1, 20)}, {"date": datetime(2030, 2, 3)}],
+        )
+        changes = await maintain_partitions(
+            connect,
+            today=date(2030, 1, 15),
+            ahead=1,
+            retention_months=0,
+            action="detach",
+        )
+        assert changes == {
+            "created": ["transfer_p203001", "transfer_p203002"],
+            "detach": [],
+        }
+        placement = await connect.execute(
+            text(
+                "SELECT tableoid::regclass::text FROM transfer ORDER BY date"
+            )
+        )
+        assert placement.scalars().all() == [
+            "transfer_p203001",
+            "transfer_p203002",
+        ]
+
+        # Секции старше срока хранения отсоединяются и переименовываются.
+        changes = await maintain_partitions(
+            connect,
+            today=date(2030, 3, 10),
+            ahead=0,
+            retention_months=1,
+            action="detach",
+        )
+        assert changes == {
+            "created": ["transfer_p203003"],
+            "detach": ["transfer_p203001"],
+        }
+        assert set(await list_partitions(connect)) == {
+            "transfer_p203002",
+            "transfer_p203003",
+        }
+        archived = await connect.scalar(
+            text("SELECT count(*) FROM transfer_archive_203001")
+        )
+        assert archived == 1
+        await connect.execute(text("DROP TABLE transfer_archive_203001"))
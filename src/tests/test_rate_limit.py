@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.rate_limit import (MemoryRateLimitBackend,
+                                 RedisRateLimitBackend, rate_limit_create)
+from services.resp import RespClient
+
+
+@pytest.mark.asyncio
+async def test_token_bucket():
+    backend = MemoryRateLimitBackend(maxsize=2)
+    with patch("services.rate_limit.monotonic", return_value=100):
+        assert await backend.acquire("a", rate=1, burst=2) == 0
+        assert await backend.acquire("a", rate=1, burst=2) == 0
+        assert await backend.acquire("a", rate=1, burst=2) == 1
+    # За полсекунды набирается половина токена.
+    with patch("services.rate_limit.monotonic", return_value=100.5):
+        assert await backend.acquire("a", rate=1, burst=2) == 0.5
+    with patch("services.rate_limit.monotonic", return_value=102):
+        assert await backend.acquire("a", rate=1, burst=2) == 0
+        # Память ограничена: самый давний клиент забывается.
+        await backend.acquire("b", rate=1, burst=2)
+        await backend.acquire("c", rate=1, burst=2)
+    assert len(backend) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_rate_limited(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    backend = MemoryRateLimitBackend(maxsize=10)
+    monkeypatch.setattr(rate_limit_create, "backend", backend)
+    monkeypatch.setattr(rate_limit_create, "rate", 0.1)
+    monkeypatch.setattr(rate_limit_create, "burst", 2)
+
+    for _ in range(2):
+        response = await async_client.post(prefix_shorten, json=link_test_data)
+        assert response.status_code == status.HTTP_201_CREATED
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "10"
+
+
+@pytest.mark.asyncio
+async def test_redis_dropped_connection_fails_open(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    async def drop(reader, writer):
+        writer.close()
+
+    server = await asyncio.start_server(drop, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = RespClient(
+        f"redis://127.0.0.1:{port}", max_connections=1, timeout=1
+    )
+    monkeypatch.setattr(
+        rate_limit_create, "backend", RedisRateLimitBackend(client, "rl:")
+    )
+    monkeypatch.setattr(rate_limit_create, "burst", 1)
+
+    # Redis закрывает соединение, а запросы всё равно пропускаются
+    async with server:
+        for _ in range(2):
+            response = await async_client.post(
+                prefix_shorten, json=link_test_data
+            )
+            assert response.status_code == status.HTTP_201_CREATED
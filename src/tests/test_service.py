@@ -0,0 +1,99 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from core.metrics import Histogram
+from main import app
+from server import available_cores, worker_count
+from services.cache import link_cache
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.1": 2, "1": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    prefix_shorten: str,
+):
+    response = await async_client.get(f"{prefix_shorten}/ping")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get("/api/v1/service/pool")
+    assert response.status_code == status.HTTP_200_OK
+    pool = response.json()
+    assert pool["checked_out"] == 0
+    assert pool["checkout_latency"]["count"] > 0
+
+
+@pytest.mark.asyncio
+async def test_metrics(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    link_id = response.json()["id"]
+    for _ in range(2):
+        await async_client.get(f"{prefix_shorten}/transfer/{link_id}")
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    metrics = response.text
+    # Одна серия на шаблон маршрута, а не на идентификатор
+    route = 'route="/api/v1/shorten/transfer/{id}"'
+    assert f'http_requests_total{{method="GET",{route},status="307"}}' in (
+        metrics)
+    assert link_id not in metrics
+    assert "http_request_db_queries_bucket" in metrics
+    assert "db_pool_checkout_duration_seconds_count" in metrics
+
+
+@pytest.mark.asyncio
+async def test_lifespan(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    link_test_data: dict,
+    prefix_shorten: str,
+):
+    response = await async_client.post(prefix_shorten, json=link_test_data)
+    link_id = response.json()["id"]
+    await link_cache.clear()
+
+    # Без старта приложения воркер не готов
+    response = await async_client.get("/api/v1/service/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    async with app.router.lifespan_context(app):
+        response = await async_client.get("/api/v1/service/ready")
+        assert response.status_code == status.HTTP_200_OK
+        # Пул прогрет, популярная ссылка уже в кеше
+        response = await async_client.get("/api/v1/service/pool")
+        assert response.json()["checked_in"] > 0
+        assert (await link_cache.get(link_id)).hit
+
+    response = await async_client.get("/api/v1/service/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_worker_count(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app_settings, "link_cache_backend", "memory")
+    # С кэшем в памяти каждого процесса воркер может быть только один
+    assert worker_count(0) == 1
+    assert worker_count(1) == 1
+    with pytest.raises(SystemExit):
+        worker_count(4)
+    monkeypatch.setattr(app_settings, "link_cache_backend", "redis")
+    assert worker_count(0) == available_cores()
+    assert worker_count(4) == 4